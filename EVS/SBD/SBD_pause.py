@@ -0,0 +1,10 @@
+import os
+import sys
+
+if __package__ in (None, ""):
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from EVS.SBD.core import run_cli
+
+if __name__ == "__main__":
+    run_cli("pause")
@@ -0,0 +1,22 @@
+from .core import (
+    clean_sentence,
+    parse_srt,
+    process_file,
+    process_sbd,
+    reconstruct_sentences,
+    run_cli,
+    segment_file,
+    segment_table,
+)
+from .segmenters import Segmenter, get_segmenter, pause_options
+from .srt import Words, iter_srt, ms_to_str, read_srt, str_to_ms
+from .table import (
+    SentenceTable,
+    csv_columns,
+    export_csv,
+    read_sentences,
+    sentence_row,
+    table_extensions,
+    write_csv,
+    write_sentences,
+)
@@ -0,0 +1,100 @@
+import os
+import re
+import sys
+
+from ..profiling import pop_profile_options, profiled, stage
+from ..stage_cache import file_digest, memoized
+from .segmenters import get_segmenter
+from .srt import read_srt
+from .table import SentenceTable, read_sentences, write_sentences
+from .word_index import build_word_index, map_spans_to_entries
+
+def parse_srt(file_path):
+    with stage("parse_srt") as counts:
+        words = read_srt(file_path)
+        counts["words"] = len(words)
+    return words
+
+def clean_sentence(sentence):
+    sentence = sentence.strip()
+    sentence = re.sub(r'\s([?.!,"](?:\s|$))', r'\1', sentence)
+    sentence = re.sub(r'\s+([,;])', r'\1', sentence)
+    sentence = re.sub(r'\s*-\s*', '-', sentence)
+    sentence = re.sub(r'\s*%\s*', '%', sentence)
+    sentence = re.sub(r'(\$)\s*', r'\1', sentence)
+    return sentence
+
+def segment_table(words, segmenter):
+    # Timings stay in integer milliseconds; they are only formatted when
+    # the table is written as CSV
+    with stage("segmentation") as counts:
+        combined_text, offsets = build_word_index(words.texts)
+        spans = segmenter.segment_words(words, combined_text, offsets)
+        counts["words"] = len(words)
+
+    with stage("timestamp_recovery") as counts:
+        sentences, starts, ends = [], [], []
+
+        for (start, end), (first, last) in zip(spans, map_spans_to_entries(offsets, spans)):
+            sentence = clean_sentence(combined_text[start:end])
+            if not sentence:
+                continue
+
+            sentences.append(sentence)
+            starts.append(words.starts[first])
+            ends.append(words.ends[last])
+
+        counts["sentences"] = len(sentences)
+        return SentenceTable(sentences, starts, ends)
+
+def reconstruct_sentences(words, segmenter):
+    return segment_table(words, segmenter).rows()
+
+def output_path(input_file, output_directory=None, extension=".csv"):
+    output_file = input_file.replace(".word.srt", extension)
+    if output_directory:
+        output_file = os.path.join(output_directory, os.path.basename(output_file))
+    return output_file
+
+def segment_file(input_file, segmenter, stage_cache=None):
+    # The sentence table of a .word.srt file; with a stage cache, a file
+    # segmented before with the same backend, model and options is read back
+    table, _ = memoized(stage_cache, "segmentation",
+                        lambda: {"srt": file_digest(input_file), **segmenter.fingerprint()},
+                        lambda: segment_table(parse_srt(input_file), segmenter), read_sentences, write_sentences)
+    return table
+
+def process_file(input_file, segmenter, output_file=None, stage_cache=None):
+    # The output format follows the extension of output_file: .csv, .npz or .parquet
+    if output_file is None:
+        output_file = output_path(input_file)
+    write_sentences(output_file, segment_file(input_file, segmenter, stage_cache))
+    return output_file
+
+def process_sbd(input_directory, output_directory, segmenter, extension=".csv", stage_cache=None):
+    # The segmenter's model is loaded on the first file that needs it and reused for the rest
+    os.makedirs(output_directory, exist_ok=True)
+    output_files = []
+    for name in sorted(os.listdir(input_directory)):
+        if name.endswith(".word.srt"):
+            input_file = os.path.join(input_directory, name)
+            output_files.append(process_file(input_file, segmenter, output_path(input_file, output_directory, extension),
+                                             stage_cache))
+    return output_files
+
+def run_cli(segmenter_name, argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    command = [segmenter_name] + argv
+    argv, report_file, dump_stage = pop_profile_options(argv)
+    if len(argv) > 1:
+        lang = argv[0]
+        input_file = argv[1]
+    else:
+        print("Please provide both the language abbreviation and the path to the .word.srt file.")
+        sys.exit(1)
+
+    if input_file.endswith(".word.srt"):
+        with profiled(report_file, dump_stage, command):
+            process_file(input_file, get_segmenter(segmenter_name, lang))
+    else:
+        print(f"Invalid file type: {input_file}. Please provide a .word.srt file.")
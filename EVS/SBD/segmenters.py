@@ -0,0 +1,333 @@
+import os
+import re
+import sys
+
+import numpy as np
+
+from ..models import installed_versions
+from ..profiling import stage
+from ..registry import resolve
+from .word_index import find_sentence_spans, pause_chunks
+
+# Every segmenter imports and loads its model on first use, so selecting one
+# backend never pulls in the others and one instance can serve many files.
+
+# Options that change how fast a segmenter runs but not its sentences
+runtime_options = ('n_process',)
+
+class Segmenter:
+    name = None
+    # Distributions whose versions decide the sentences, e.g. the library and its model package
+    packages = ()
+
+    def __init__(self, language, model_dir=None, **options):
+        self.language = language
+        self.model_dir = model_dir
+        self.options = options
+        self.nlp = None
+
+    def load(self):
+        raise NotImplementedError
+
+    def fetch(self, directory):
+        # Saves the model files under `directory` so they can be pinned in
+        # the model store and loaded offline from then on
+        raise NotImplementedError(f"The {self.name} segmenter has no model files to fetch")
+
+    def split(self, text):
+        raise NotImplementedError
+
+    def ready(self):
+        if self.nlp is None:
+            with stage("sbd_model_load"):
+                self.nlp = self.load()
+        return self
+
+    def segment(self, text):
+        self.ready()
+        return self.split(text)
+
+    def fingerprint(self):
+        # Everything besides the words that the sentences depend on; part
+        # of the segmentation key of the stage cache
+        return {
+            'sbd': self.name,
+            'language': self.language,
+            'model': self.model_dir or '',
+            'versions': installed_versions(self.packages),
+            'options': {key: value for key, value in self.options.items() if key not in runtime_options},
+        }
+
+    def segment_words(self, words, combined_text, offsets):
+        # Backends that can use the word timing override this
+        return self.segment(combined_text)
+
+    def chunks(self, words, offsets):
+        # Pause-delimited pieces that bound the text a heavy model sees at once
+        return pause_chunks(words, offsets,
+                            self.options.get('pause_ms', 1000),
+                            self.options.get('min_chars', 1000),
+                            self.options.get('max_chars', 20000))
+
+    def stitch(self, combined_text, chunks, chunk_spans):
+        # Shifts per-chunk sentence spans back into the joined text; a chunk
+        # whose last sentence has no final punctuation continues in the next
+        spans = []
+        open_start = None
+        for (chunk_start, _), sentence_spans in zip(chunks, chunk_spans):
+            for start, end in sentence_spans:
+                start += chunk_start
+                end += chunk_start
+                if open_start is not None:
+                    start = open_start
+                    open_start = None
+                spans.append((start, end))
+            if spans and not sentence_end_pattern.search(combined_text[spans[-1][0]:spans[-1][1]]):
+                open_start = spans.pop()[0]
+        if open_start is not None:
+            spans.append((open_start, len(combined_text)))
+        return spans
+
+sentence_end_pattern = re.compile(r'[.!?。！？…]["\')\]]*\s*$')
+
+punkt_languages = {
+    'en': 'english',
+    'fr': 'french',
+    'de': 'german',
+    'es': 'spanish',
+    'it': 'italian',
+    'nl': 'dutch',
+    'pt': 'portuguese',
+}
+
+class PunktSegmenter(Segmenter):
+    name = 'punkt'
+    packages = ('nltk',)
+
+    def load(self):
+        import nltk
+        if self.model_dir:
+            # A pinned copy is used as is; a missing one is an error, not a download
+            nltk.data.path.insert(0, self.model_dir)
+            nltk.data.find('tokenizers/punkt')
+            return nltk
+        try:
+            nltk.data.find('tokenizers/punkt')
+        except LookupError:
+            nltk.download('punkt')
+        return nltk
+
+    def fetch(self, directory):
+        import nltk
+        if not nltk.download('punkt', download_dir=directory, raise_on_error=True):
+            raise RuntimeError("Could not download the Punkt models")
+
+    def split(self, text):
+        language = punkt_languages.get(self.language, 'english')
+        return find_sentence_spans(text, self.nlp.sent_tokenize(text, language=language))
+
+lang_to_model = {
+    'zh': 'zh_core_web_trf',
+    'nl': 'nl_core_news_lg',
+    'en': 'en_core_web_trf',
+    'fr': 'fr_dep_news_trf',
+    'de': 'de_dep_news_trf',
+    'it': 'it_core_news_lg',
+    'ja': 'ja_core_news_trf',
+    'pt': 'pt_core_news_lg',
+    'es': 'es_dep_news_trf',
+    'uk': 'uk_core_news_trf',
+}
+
+class SpacySegmenter(Segmenter):
+    # Components that play no part in sentence boundaries are never loaded.
+    # Long transcripts are cut into chunks at pauses in the speech and
+    # streamed through nlp.pipe, so memory follows the chunk size rather
+    # than the session length and spaCy's max_length is never reached.
+    name = 'spacy'
+    excluded_components = ['tagger', 'morphologizer', 'lemmatizer', 'trainable_lemmatizer',
+                           'attribute_ruler', 'ner', 'entity_ruler', 'entity_linker', 'textcat']
+
+    @property
+    def packages(self):
+        return ('spacy', lang_to_model.get(self.language, ''))
+
+    def load(self):
+        model_name = lang_to_model.get(self.language)
+        if not model_name:
+            print(f"Unsupported language: {self.language}")
+            sys.exit(1)
+        try:
+            import spacy
+            nlp = spacy.load(self.model_dir or model_name, exclude=self.excluded_components)
+            nlp.add_pipe("sentencizer")
+            return nlp
+        except Exception as e:
+            print(f"Error loading model '{model_name}': {e}")
+            print("Please make sure the language model is installed.")
+            sys.exit(1)
+
+    def fetch(self, directory):
+        import spacy
+        model_name = lang_to_model[self.language]
+        if not spacy.util.is_package(model_name):
+            spacy.cli.download(model_name)
+        spacy.load(model_name).to_disk(directory)
+
+    def split(self, text):
+        doc = self.nlp(text)
+        return [(sent.start_char, sent.end_char) for sent in doc.sents]
+
+    def segment_words(self, words, combined_text, offsets):
+        self.ready()
+        chunks = self.chunks(words, offsets)
+        docs = self.nlp.pipe((combined_text[start:end] for start, end in chunks),
+                             n_process=self.options.get('n_process', 1), batch_size=4)
+        return self.stitch(combined_text, chunks,
+                           ([(sent.start_char, sent.end_char) for sent in doc.sents] for doc in docs))
+
+# Languages whose Stanza tokenizer is followed by multi-word token expansion
+stanza_mwt_languages = {'ar', 'ca', 'cs', 'de', 'es', 'fr', 'gl', 'it', 'pl', 'pt', 'tr'}
+
+class StanzaSegmenter(Segmenter):
+    # Only the processors SBD needs are loaded (no POS, lemma, parser or NER),
+    # from a local model directory; the network is only used when the
+    # tokenizer for the language has never been downloaded there.
+    name = 'stanza'
+    packages = ('stanza',)
+
+    def load(self):
+        try:
+            import stanza
+            processors = 'tokenize,mwt' if self.language in stanza_mwt_languages else 'tokenize'
+            model_dir = self.model_dir or os.environ.get('STANZA_RESOURCES_DIR') or os.path.expanduser('~/stanza_resources')
+            if not os.path.isdir(os.path.join(model_dir, self.language, 'tokenize')):
+                stanza.download(self.language, model_dir=model_dir, processors=processors)
+            options = {}
+            if tuple(int(part) for part in stanza.__version__.split('.')[:2]) >= (1, 4):
+                # Newer Stanza fetches resources.json on every Pipeline unless told not to
+                options['download_method'] = None
+            return stanza.Pipeline(self.language, dir=model_dir, processors=processors, **options)
+        except Exception as e:
+            print(f"Error loading model '{self.language}': {e}")
+            print("Please make sure the language model is installed.")
+            sys.exit(1)
+
+    def fetch(self, directory):
+        import stanza
+        processors = 'tokenize,mwt' if self.language in stanza_mwt_languages else 'tokenize'
+        stanza.download(self.language, model_dir=directory, processors=processors)
+
+    def split(self, text):
+        doc = self.nlp(text)
+        return [(sent.tokens[0].start_char, sent.tokens[-1].end_char) for sent in doc.sentences]
+
+    def segment_words(self, words, combined_text, offsets):
+        self.ready()
+        chunks = self.chunks(words, offsets)
+        return self.stitch(combined_text, chunks, (self.split(combined_text[start:end]) for start, end in chunks))
+
+class RuleSegmenter(Segmenter):
+    name = 'rule'
+
+    sentence_pattern = re.compile(r'\S.*?(?:[.!?。！？]+["\')\]]*(?=\s|$)|$)', re.S)
+
+    def load(self):
+        return self.sentence_pattern
+
+    def split(self, text):
+        return [match.span() for match in self.nlp.finditer(text)]
+
+# Silence (ms) that ends a sentence on its own, and the silence required after
+# sentence-final punctuation; options passed to the segmenter override these
+pause_settings = {
+    'default': {'pause_ms': 2000, 'punctuation_pause_ms': 0},
+    'ja': {'pause_ms': 1500, 'punctuation_pause_ms': 0},
+    'zh': {'pause_ms': 1500, 'punctuation_pause_ms': 0},
+}
+
+def language_value(values, language):
+    # The value for `language` among command-line values that are either
+    # a number for every language or LANGUAGE=NUMBER for one; a value for
+    # the language itself wins over one for every language
+    shared = specific = None
+    for value in values or ():
+        value_language, separator, number = value.rpartition('=')
+        if not separator:
+            shared = int(number)
+        elif value_language == language:
+            specific = int(number)
+    return specific if specific is not None else shared
+
+def pause_options(language, pause_ms=None, punctuation_pause_ms=None):
+    # Segmenter options from --pause_ms and --punctuation_pause_ms; only the
+    # thresholds given for this language (or for all) override pause_settings
+    options = {}
+    for key, values in (('pause_ms', pause_ms), ('punctuation_pause_ms', punctuation_pause_ms)):
+        value = language_value(values, language)
+        if value is not None:
+            options[key] = value
+    return options
+
+abbreviations = {
+    'en': {'mr.', 'mrs.', 'ms.', 'dr.', 'prof.', 'st.', 'vs.', 'etc.', 'e.g.', 'i.e.', 'no.'},
+    'pt': {'sr.', 'sra.', 'dr.', 'dra.', 'prof.', 'etc.', 'p.', 'ex.', 'n.º', 'nº.'},
+    'es': {'sr.', 'sra.', 'dr.', 'dra.', 'etc.', 'p.', 'ej.'},
+    'fr': {'m.', 'mme.', 'dr.', 'etc.', 'p.', 'ex.'},
+    'de': {'hr.', 'fr.', 'dr.', 'prof.', 'usw.', 'z.b.', 'bzw.', 'ca.'},
+}
+
+class PauseSegmenter(Segmenter):
+    # No model: a sentence ends at final punctuation followed by at least
+    # `punctuation_pause_ms` of silence (abbreviations excepted), or at any
+    # silence of `pause_ms`. Everything is computed on arrays of word timings.
+    name = 'pause'
+
+    def load(self):
+        settings = dict(pause_settings.get(self.language, pause_settings['default']))
+        settings.update((key, self.options[key]) for key in settings if key in self.options)
+        return settings
+
+    def split(self, text):
+        # Without timings only the punctuation cue is available
+        return RuleSegmenter(self.language).ready().split(text)
+
+    def segment_words(self, words, combined_text, offsets):
+        self.ready()
+        n = len(words)
+        if n == 0:
+            return []
+        texts = words.texts
+        starts = np.frombuffer(words.starts, dtype=np.int64)
+        ends = np.frombuffer(words.ends, dtype=np.int64)
+        gaps = starts[1:] - ends[:-1]
+
+        language_abbreviations = abbreviations.get(self.language, set())
+        punctuated = np.fromiter((sentence_end_pattern.search(text) is not None and text.lower() not in language_abbreviations
+                                  for text in texts[:-1]), bool, n - 1)
+        boundary = (punctuated & (gaps >= self.nlp['punctuation_pause_ms'])) | (gaps >= self.nlp['pause_ms'])
+
+        last_entries = np.append(np.flatnonzero(boundary), n - 1)
+        first_entries = np.concatenate(([0], last_entries[:-1] + 1))
+        return [(offsets[first], offsets[last] + len(texts[last])) for first, last in zip(first_entries, last_entries)]
+
+def create_segmenter(name, language, model_dir=None, **options):
+    # A local segmenter; model_dir defaults to the copy pinned in the model store
+    segmenter_class = resolve('sbd', name)
+    if model_dir is None:
+        from ..models import pinned_path
+        model_dir = pinned_path('sbd', name, language)
+    return segmenter_class(language, model_dir, **options)
+
+def get_segmenter(name, language, model_dir=None, **options):
+    # With EVS_MODEL_SERVER set, the model stays loaded in that server instead
+    try:
+        address = os.environ.get('EVS_MODEL_SERVER')
+        if address:
+            resolve('sbd', name)
+            from ..server import RemoteSegmenter
+            return RemoteSegmenter(name, language, address, **options)
+        return create_segmenter(name, language, model_dir, **options)
+    except KeyError as e:
+        print(e.args[0])
+        sys.exit(1)
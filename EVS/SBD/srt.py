@@ -0,0 +1,105 @@
+import re
+from array import array
+
+timecode_pattern = re.compile(r'(\d+):(\d\d):(\d\d)[,.](\d{1,3})\s*-->\s*(\d+):(\d\d):(\d\d)[,.](\d{1,3})')
+
+class Words:
+    # Word-level transcript as parallel columns: int64 millisecond start and
+    # end times in compact arrays plus the token strings
+
+    def __init__(self, starts=(), ends=(), texts=()):
+        self.starts = array('q', starts)
+        self.ends = array('q', ends)
+        self.texts = list(texts)
+
+    def __len__(self):
+        return len(self.texts)
+
+    def append(self, start, end, text):
+        self.starts.append(start)
+        self.ends.append(end)
+        self.texts.append(text)
+
+    def drop(self, count):
+        del self.starts[:count]
+        del self.ends[:count]
+        del self.texts[:count]
+
+def timecode_ms(hours, minutes, seconds, milliseconds):
+    return ((int(hours) * 60 + int(minutes)) * 60 + int(seconds)) * 1000 + int(milliseconds.ljust(3, '0'))
+
+def parse_timing(line):
+    # Fast path for the canonical "HH:MM:SS,mmm --> HH:MM:SS,mmm" layout
+    if len(line) == 29 and line[2] == ':' and line[5] == ':' and line[13:16] == '-->':
+        try:
+            return (int(line[0:2]) * 3600000 + int(line[3:5]) * 60000 + int(line[6:8]) * 1000 + int(line[9:12]),
+                    int(line[17:19]) * 3600000 + int(line[20:22]) * 60000 + int(line[23:25]) * 1000 + int(line[26:29]))
+        except ValueError:
+            pass
+    match = timecode_pattern.search(line)
+    if match is None:
+        return None
+    groups = match.groups()
+    return timecode_ms(*groups[:4]), timecode_ms(*groups[4:])
+
+def ms_to_str(ms):
+    seconds, milliseconds = divmod(ms, 1000)
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:02}:{minutes:02}:{seconds:02},{milliseconds:03}"
+
+def str_to_ms(time):
+    # Inverse of ms_to_str; "." is accepted in place of ","
+    hours, minutes, rest = time.split(':')
+    seconds, _, milliseconds = rest.replace('.', ',').partition(',')
+    return ((int(hours) * 60 + int(minutes)) * 60 + int(seconds)) * 1000 + int(milliseconds.ljust(3, '0'))
+
+class SrtParser:
+    # Incremental SRT block parser: feed complete lines, get (start_ms,
+    # end_ms, text) back whenever a block is closed by a blank line
+
+    def __init__(self):
+        self.timing = None
+        self.text = []
+
+    def feed(self, line):
+        line = line.strip()
+        if not line:
+            return self.finish()
+        timing = None
+        if "-->" in line and (self.timing is None or not self.text):
+            timing = parse_timing(line)
+        if timing is not None:
+            self.timing = timing
+            self.text = []
+        elif self.timing is not None:
+            self.text.append(line)
+        # Lines before the timecode (the block index) are skipped
+        return None
+
+    def finish(self):
+        entry = None
+        if self.timing is not None:
+            entry = (self.timing[0], self.timing[1], " ".join(self.text))
+        self.timing = None
+        self.text = []
+        return entry
+
+def iter_srt(file_path):
+    # Yields one (start_ms, end_ms, text) entry at a time, so arbitrarily
+    # large files are never held in memory as a whole
+    parser = SrtParser()
+    with open(file_path, encoding="utf-8-sig") as srtfile:
+        for line in srtfile:
+            entry = parser.feed(line)
+            if entry is not None:
+                yield entry
+    entry = parser.finish()
+    if entry is not None:
+        yield entry
+
+def read_srt(file_path):
+    words = Words()
+    for start, end, text in iter_srt(file_path):
+        words.append(start, end, text)
+    return words
@@ -0,0 +1,186 @@
+import csv
+import os
+import struct
+import zipfile
+
+import numpy as np
+
+from ..profiling import stage
+from .srt import ms_to_str, str_to_ms
+
+csv_columns = ["sequence", "sentence", "start", "end", "duration", "word_count"]
+
+table_extensions = (".csv", ".npz", ".parquet")
+
+def sentence_row(sequence, sentence, start_ms, end_ms):
+    return [
+        sequence,
+        sentence,
+        ms_to_str(start_ms),
+        ms_to_str(end_ms),
+        ms_to_str(end_ms - start_ms),
+        len(sentence.split()),
+    ]
+
+class SentenceTable:
+    # Sentences of one transcript as columns: the texts, int64 millisecond
+    # start and end times, word counts, and optionally the sentence embeddings
+    # together with the "model@revision/language" they were computed with
+
+    def __init__(self, sentences=(), start_ms=(), end_ms=(), word_count=None, embeddings=None, embedding_model=None):
+        self.sentences = list(sentences)
+        self.start_ms = np.asarray(start_ms, dtype=np.int64)
+        self.end_ms = np.asarray(end_ms, dtype=np.int64)
+        if word_count is None:
+            word_count = [len(sentence.split()) for sentence in self.sentences]
+        self.word_count = np.asarray(word_count, dtype=np.int32)
+        self.embeddings = embeddings
+        self.embedding_model = embedding_model
+
+    def __len__(self):
+        return len(self.sentences)
+
+    def rows(self):
+        return [sentence_row(sequence, sentence, start, end) for sequence, (sentence, start, end)
+                in enumerate(zip(self.sentences, self.start_ms.tolist(), self.end_ms.tolist()), 1)]
+
+    def to_frame(self):
+        import pandas as pd
+
+        return pd.DataFrame({
+            "sentence": self.sentences,
+            "start_ms": self.start_ms,
+            "end_ms": self.end_ms,
+            "word_count": self.word_count,
+        })
+
+def write_csv(output_file, sentences):
+    with open(output_file, "w", encoding="utf-8", newline="") as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(csv_columns)
+        for sentence in sentences:
+            writer.writerow(sentence)
+
+def read_csv(file_path):
+    with open(file_path, encoding="utf-8", newline="") as csvfile:
+        rows = list(csv.DictReader(csvfile))
+    return SentenceTable([row["sentence"] for row in rows], [str_to_ms(row["start"]) for row in rows],
+                         [str_to_ms(row["end"]) for row in rows], [int(row["word_count"]) for row in rows])
+
+def write_npz(output_file, table):
+    # Uncompressed, so that every member can be memory-mapped by read_npz
+    text = "".join(table.sentences)
+    bounds = np.zeros(len(table) + 1, dtype=np.int64)
+    np.cumsum([len(sentence) for sentence in table.sentences], out=bounds[1:])
+    columns = {
+        "text": np.frombuffer(text.encode("utf-8"), dtype=np.uint8),
+        "bounds": bounds,
+        "start_ms": table.start_ms,
+        "end_ms": table.end_ms,
+        "word_count": table.word_count,
+    }
+    if table.embeddings is not None:
+        columns["embeddings"] = np.asarray(table.embeddings, dtype=np.float32)
+        columns["embedding_model"] = np.array(table.embedding_model)
+    with open(output_file, "wb") as npzfile:
+        np.savez(npzfile, **columns)
+
+def mmap_npz(file_path):
+    # np.load cannot memory-map the members of an .npz, but stored (not
+    # deflated) members are plain .npy files at a known offset in the archive
+    arrays = {}
+    with zipfile.ZipFile(file_path) as archive, open(file_path, "rb") as npzfile:
+        for info in archive.infolist():
+            name = info.filename[:-len(".npy")]
+            if info.compress_type != zipfile.ZIP_STORED:
+                arrays[name] = np.load(archive.open(info))
+                continue
+            npzfile.seek(info.header_offset + 26)
+            name_length, extra_length = struct.unpack("<HH", npzfile.read(4))
+            npzfile.seek(info.header_offset + 30 + name_length + extra_length)
+            version = np.lib.format.read_magic(npzfile)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(npzfile)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(npzfile)
+            if dtype.hasobject or int(np.prod(shape)) == 0:
+                npzfile.seek(info.header_offset + 30 + name_length + extra_length)
+                arrays[name] = np.lib.format.read_array(npzfile)
+            else:
+                arrays[name] = np.memmap(file_path, dtype=dtype, mode="r", offset=npzfile.tell(),
+                                         shape=shape, order="F" if fortran_order else "C")
+    return arrays
+
+def read_npz(file_path):
+    arrays = mmap_npz(file_path)
+    text = arrays["text"].tobytes().decode("utf-8")
+    bounds = arrays["bounds"].tolist()
+    sentences = [text[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+    embedding_model = str(arrays["embedding_model"]) if "embedding_model" in arrays else None
+    return SentenceTable(sentences, arrays["start_ms"], arrays["end_ms"], arrays["word_count"],
+                         arrays.get("embeddings"), embedding_model)
+
+def write_parquet(output_file, table):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    columns = {
+        "sentence": pa.array(table.sentences, type=pa.string()),
+        "start_ms": pa.array(table.start_ms, type=pa.int64()),
+        "end_ms": pa.array(table.end_ms, type=pa.int64()),
+        "word_count": pa.array(table.word_count, type=pa.int32()),
+    }
+    metadata = {}
+    if table.embeddings is not None:
+        embeddings = np.asarray(table.embeddings, dtype=np.float32)
+        columns["embedding"] = pa.FixedSizeListArray.from_arrays(pa.array(embeddings.ravel()), embeddings.shape[1])
+        metadata[b"embedding_model"] = table.embedding_model.encode("utf-8")
+    pq.write_table(pa.table(columns).replace_schema_metadata(metadata), output_file)
+
+def read_parquet(file_path):
+    import pyarrow.parquet as pq
+
+    parquet = pq.read_table(file_path, memory_map=True)
+    embeddings = embedding_model = None
+    if "embedding" in parquet.column_names:
+        column = parquet.column("embedding").combine_chunks()
+        embeddings = column.flatten().to_numpy().reshape(len(column), column.type.list_size)
+        embedding_model = parquet.schema.metadata[b"embedding_model"].decode("utf-8")
+    return SentenceTable(parquet.column("sentence").to_pylist(), parquet.column("start_ms").to_numpy(),
+                         parquet.column("end_ms").to_numpy(), parquet.column("word_count").to_numpy(),
+                         embeddings, embedding_model)
+
+def write_sentences(output_file, table):
+    # The format follows the extension. The file is written next to the
+    # target and moved into place, so a table that is still memory-mapped
+    # from the old file stays readable.
+    extension = os.path.splitext(output_file)[1]
+    temporary_file = f"{output_file}.tmp{extension}"
+    with stage("write") as counts:
+        if extension == ".npz":
+            write_npz(temporary_file, table)
+        elif extension == ".parquet":
+            write_parquet(temporary_file, table)
+        else:
+            write_csv(temporary_file, table.rows())
+        os.replace(temporary_file, output_file)
+        counts["sentences"] = len(table)
+    return output_file
+
+def read_sentences(file_path):
+    extension = os.path.splitext(file_path)[1]
+    with stage("read_sentences") as counts:
+        if extension == ".npz":
+            table = read_npz(file_path)
+        elif extension == ".parquet":
+            table = read_parquet(file_path)
+        else:
+            table = read_csv(file_path)
+        counts["sentences"] = len(table)
+    return table
+
+def export_csv(table_file, csv_file=None):
+    if csv_file is None:
+        csv_file = os.path.splitext(table_file)[0] + ".csv"
+    write_csv(csv_file, read_sentences(table_file).rows())
+    return csv_file
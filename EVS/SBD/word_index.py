@@ -0,0 +1,56 @@
+def build_word_index(texts):
+    # Character offset of every subtitle entry inside the space-joined text
+    offsets = []
+    position = 0
+    for text in texts:
+        offsets.append(position)
+        position += len(text) + 1
+    combined_text = " ".join(texts)
+    return combined_text, offsets
+
+def find_sentence_spans(combined_text, sentences):
+    # Segmenters that only return strings are located with a forward cursor,
+    # so every character of the text is scanned at most once
+    spans = []
+    cursor = 0
+    for sent in sentences:
+        stripped = sent.strip()
+        if not stripped:
+            continue
+        start = combined_text.find(stripped, cursor)
+        if start == -1:
+            continue
+        end = start + len(stripped)
+        spans.append((start, end))
+        cursor = end
+    return spans
+
+def map_spans_to_entries(offsets, spans):
+    # Spans must be sorted by start; one forward pass over the entries
+    entry = 0
+    last_entry = len(offsets) - 1
+    for start, end in spans:
+        while entry < last_entry and offsets[entry + 1] <= start:
+            entry += 1
+        last = entry
+        while last < last_entry and offsets[last + 1] < end:
+            last += 1
+        yield entry, last
+        entry = last
+
+def pause_chunks(words, offsets, pause_ms=1000, min_chars=1000, max_chars=20000):
+    # Character ranges of the joined text cut at silences of at least
+    # `pause_ms` once a chunk has `min_chars`, and anywhere past `max_chars`
+    chunks = []
+    chunk_start = 0
+    starts = words.starts
+    ends = words.ends
+    for i in range(1, len(words)):
+        length = offsets[i] - 1 - chunk_start
+        gap = starts[i] - ends[i - 1]
+        if (gap >= pause_ms and length >= min_chars) or length >= max_chars:
+            chunks.append((chunk_start, offsets[i] - 1))
+            chunk_start = offsets[i]
+    if len(words):
+        chunks.append((chunk_start, offsets[-1] + len(words.texts[-1])))
+    return chunks
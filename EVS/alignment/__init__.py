@@ -0,0 +1,28 @@
+from .core import (
+    accept_pairs,
+    align_directories,
+    align_embeddings,
+    align_pair,
+    align_sentences,
+    aligned_frame,
+    alignment_columns,
+    alignment_inputs,
+    alignment_path,
+    aligners,
+    cosine_similarity,
+    embedding_model,
+    encoding_inputs,
+    ms_to_time,
+    read_alignment,
+    run_cli,
+    seconds_to_time,
+    start_milliseconds,
+    table_embeddings,
+    time_difference,
+    time_to_ms,
+    to_milliseconds,
+    write_alignment,
+)
+from .cache import EmbeddingCache
+from .encoders import Encoder, get_encoder
+from .sweep import accept_matrix, sweep_sentences, sweep_thresholds, threshold_grid
@@ -0,0 +1,233 @@
+import bisect
+
+import numpy as np
+import pandas as pd
+
+from ..profiling import stage
+from .core import accept_pairs, alignment_columns, ms_to_time, start_milliseconds, start_times
+from .dtw import normalize, time_window_bounds, window_ranges, windowed_path
+
+# An aligner that keeps sentences the interpreter merged or split. Mutual
+# best matches inside the time window become anchors; the sentences between
+# two anchors are aligned by a small search over beads of one or two
+# consecutive sentences per side; and a sentence left out next to an aligned
+# bead joins it when that makes the bead more similar. Only the cells inside
+# the time window and inside the gaps are scored, so the work grows with the
+# session length rather than with the full grid.
+
+default_time_window = (2, 15)
+
+# (source sentences, target sentences) per bead searched in a gap
+bead_shapes = ((1, 1), (2, 1), (1, 2))
+
+def candidate_cells(source_start, target_start, before, after):
+    # (source, target) index pairs whose start times fit the window, row by row
+    lo, hi = window_ranges(source_start, target_start, before, after)
+    counts = np.maximum(hi - lo, 0)
+    rows = np.repeat(np.arange(len(lo)), counts)
+    offsets = np.cumsum(counts) - counts
+    cols = lo[rows] + np.arange(len(rows)) - offsets[rows]
+    return rows, cols
+
+def cell_similarities(source, target, rows, cols, chunk=65536):
+    # Cosine of each candidate cell, from normalized embeddings
+    similarity = np.empty(len(rows))
+    for start in range(0, len(rows), chunk):
+        stop = start + chunk
+        similarity[start:stop] = np.einsum('ij,ij->i', source[rows[start:stop]], target[cols[start:stop]])
+    return similarity
+
+def group_argmax(group, values, groups):
+    # Index of the largest value of every group, or -1 for empty groups
+    best = np.full(groups, -1, dtype=np.intp)
+    if len(group) == 0:
+        return best
+    order = np.lexsort((-values, group))
+    sorted_group = group[order]
+    first = np.flatnonzero(np.r_[True, sorted_group[1:] != sorted_group[:-1]])
+    best[sorted_group[first]] = order[first]
+    return best
+
+def monotone_chain(source_idx, target_idx):
+    # Positions of the longest run of pairs increasing in both indices;
+    # source_idx is already increasing, so this is a longest increasing
+    # subsequence of target_idx
+    tails, tail_positions = [], []
+    previous = np.full(len(target_idx), -1, dtype=np.intp)
+    for position, j in enumerate(target_idx.tolist()):
+        length = bisect.bisect_left(tails, j)
+        if length > 0:
+            previous[position] = tail_positions[length - 1]
+        if length == len(tails):
+            tails.append(j)
+            tail_positions.append(position)
+        else:
+            tails[length] = j
+            tail_positions[length] = position
+    chain = []
+    position = tail_positions[-1] if tail_positions else -1
+    while position >= 0:
+        chain.append(position)
+        position = previous[position]
+    return np.array(chain[::-1], dtype=np.intp)
+
+def mutual_best_anchors(source, target, source_start, target_start, before, after, similarity_threshold):
+    # Pairs that are each other's best match within the window, above the
+    # threshold, reduced to a monotone chain: (source_idx, target_idx, similarity)
+    rows, cols = candidate_cells(source_start, target_start, before, after)
+    similarity = cell_similarities(source, target, rows, cols)
+    best_target = group_argmax(rows, similarity, len(source))
+    best_source = group_argmax(cols, similarity, len(target))
+    cells = best_target[best_target >= 0]
+    cells = cells[(best_source[cols[cells]] == cells) & (similarity[cells] >= similarity_threshold)]
+    chain = cells[monotone_chain(rows[cells], cols[cells])]
+    return rows[chain], cols[chain], similarity[chain]
+
+def merged(vectors, size):
+    # Normalized sums of `size` consecutive normalized vectors
+    total = vectors[:len(vectors) - size + 1].copy()
+    for offset in range(1, size):
+        total += vectors[offset:len(vectors) - size + 1 + offset]
+    return normalize(total)
+
+def gap_beads(source, target, source_start, target_start, sources, targets, similarity_threshold, before, after):
+    # Best set of 1-1, 2-1 and 1-2 beads between two anchors: each bead
+    # scores its similarity minus the threshold, sentences may be left out
+    # at no cost, and a bead must start inside the time window
+    s0, s1 = sources
+    t0, t1 = targets
+    n, m = s1 - s0, t1 - t0
+    similarity = {}
+    for a, b in bead_shapes:
+        if n >= a and m >= b:
+            similarity[a, b] = merged(source[s0:s1], a) @ merged(target[t0:t1], b).T
+    lag = target_start[t0:t1][None, :] - source_start[s0:s1][:, None]
+    allowed = ((lag >= -before) & (lag <= after)).tolist()
+    similarity_lists = {shape: values.tolist() for shape, values in similarity.items()}
+
+    score = [[0.0] * (m + 1) for _ in range(n + 1)]
+    step = [[None] * (m + 1) for _ in range(n + 1)]
+    for p in range(n + 1):
+        for q in range(m + 1):
+            if p == 0 and q == 0:
+                continue
+            best, best_step = -np.inf, None
+            # Beads first, so that a bead right at the threshold wins a tie
+            for (a, b), values in similarity_lists.items():
+                if p >= a and q >= b and allowed[p - a][q - b]:
+                    value = score[p - a][q - b] + values[p - a][q - b] - similarity_threshold
+                    if value > best:
+                        best, best_step = value, (a, b)
+            if p > 0 and score[p - 1][q] > best:
+                best, best_step = score[p - 1][q], (1, 0)
+            if q > 0 and score[p][q - 1] > best:
+                best, best_step = score[p][q - 1], (0, 1)
+            score[p][q], step[p][q] = best, best_step
+
+    beads = []
+    p, q = n, m
+    while p > 0 or q > 0:
+        a, b = step[p][q]
+        p, q = p - a, q - b
+        if a and b and similarity_lists[a, b][p][q] >= similarity_threshold:
+            beads.append((list(range(s0 + p, s0 + p + a)), list(range(t0 + q, t0 + q + b)), similarity_lists[a, b][p][q]))
+    return beads[::-1]
+
+def windowed_beads(source, target, source_start, target_start, sources, targets, similarity_threshold, before, after):
+    # One-to-one pairs for a gap too long for the bead search: windowed DTW
+    # and greedy acceptance, as in align_embeddings
+    s0, s1 = sources
+    t0, t1 = targets
+    lo, hi = time_window_bounds(source_start[s0:s1], target_start[t0:t1], before, after)
+    _, path, path_similarity = windowed_path(source[s0:s1], target[t0:t1], lo, hi)
+    path = np.array(path, dtype=np.intp).reshape(-1, 2)
+    similarity = dict(zip(map(tuple, path.tolist()), path_similarity.tolist()))
+    return [([s0 + i], [t0 + j], similarity[i, j]) for i, j in accept_pairs(path, path_similarity, similarity_threshold)]
+
+def bead_similarity(source, target, source_idx, target_idx):
+    source_vector = source[source_idx].sum(axis=0)
+    target_vector = target[target_idx].sum(axis=0)
+    norm = np.linalg.norm(source_vector) * np.linalg.norm(target_vector)
+    return float(source_vector @ target_vector / norm) if norm else 0.0
+
+def attach_neighbours(beads, source, target, max_sentences=3):
+    # A sentence left out right before or after a bead, on either side,
+    # joins the bead while that raises the bead's similarity
+    used_source = {i for source_idx, _, _ in beads for i in source_idx}
+    used_target = {j for _, target_idx, _ in beads for j in target_idx}
+    attached = []
+    for source_idx, target_idx, similarity in beads:
+        while True:
+            candidates = []
+            if len(source_idx) < max_sentences:
+                for i in (source_idx[0] - 1, source_idx[-1] + 1):
+                    if 0 <= i < len(source) and i not in used_source:
+                        merged_idx = sorted(source_idx + [i])
+                        candidates.append((bead_similarity(source, target, merged_idx, target_idx), merged_idx, target_idx))
+            if len(target_idx) < max_sentences:
+                for j in (target_idx[0] - 1, target_idx[-1] + 1):
+                    if 0 <= j < len(target) and j not in used_target:
+                        merged_idx = sorted(target_idx + [j])
+                        candidates.append((bead_similarity(source, target, source_idx, merged_idx), source_idx, merged_idx))
+            if not candidates:
+                break
+            best = max(candidates, key=lambda candidate: candidate[0])
+            if best[0] <= similarity:
+                break
+            similarity, source_idx, target_idx = best
+            used_source.update(source_idx)
+            used_target.update(target_idx)
+        attached.append((source_idx, target_idx, similarity))
+    return attached
+
+def bead_frame(source_df, target_df, source_start, target_start, beads):
+    # One row per bead; merged sentences are joined, and EVS runs from the
+    # first source sentence to the first target sentence of the bead
+    if not beads:
+        return pd.DataFrame(columns=alignment_columns)
+    source_first = np.array([source_idx[0] for source_idx, _, _ in beads], dtype=np.intp)
+    target_first = np.array([target_idx[0] for _, target_idx, _ in beads], dtype=np.intp)
+    source_sentences = source_df['sentence'].to_numpy()
+    target_sentences = target_df['sentence'].to_numpy()
+    evs_ms = target_start[target_first] - source_start[source_first]
+    return pd.DataFrame({
+        'sequence': np.arange(1, len(beads) + 1),
+        'source_sentence': [" ".join(source_sentences[source_idx]) for source_idx, _, _ in beads],
+        'target_sentence': [" ".join(target_sentences[target_idx]) for _, target_idx, _ in beads],
+        'source_start': start_times(source_df, source_start, source_first),
+        'target_start': start_times(target_df, target_start, target_first),
+        'EVS': [ms_to_time(ms) for ms in evs_ms],
+        'EVS_ms': evs_ms,
+    })
+
+def align_anchored(source_df, target_df, source_embeddings, target_embeddings, similarity_threshold, time_window=None, max_gap=30):
+    # Gaps with more than `max_gap` sentences on a side fall back to
+    # one-to-one windowed DTW, which keeps the bead search small
+    if len(source_df) == 0 or len(target_df) == 0:
+        return pd.DataFrame(columns=alignment_columns)
+    before, after = (seconds * 1000 for seconds in (time_window or default_time_window))
+    source_start = start_milliseconds(source_df)
+    target_start = start_milliseconds(target_df)
+
+    with stage("anchors") as counts:
+        source = normalize(source_embeddings)
+        target = normalize(target_embeddings)
+        anchor_source, anchor_target, anchor_similarity = mutual_best_anchors(
+            source, target, source_start, target_start, before, after, similarity_threshold)
+
+        beads = []
+        bounds = [(-1, -1)] + list(zip(anchor_source.tolist(), anchor_target.tolist())) + [(len(source), len(target))]
+        for k, ((i0, j0), (i1, j1)) in enumerate(zip(bounds[:-1], bounds[1:])):
+            sources, targets = (i0 + 1, i1), (j0 + 1, j1)
+            if sources[1] > sources[0] and targets[1] > targets[0]:
+                search = gap_beads if max(i1 - i0, j1 - j0) - 1 <= max_gap else windowed_beads
+                beads += search(source, target, source_start, target_start, sources, targets, similarity_threshold, before, after)
+            if k < len(anchor_source):
+                beads.append(([i1], [j1], float(anchor_similarity[k])))
+        beads = attach_neighbours(beads, source, target)
+
+        counts["sentences"] = len(source) + len(target)
+        counts["anchors"] = len(anchor_source)
+        counts["pairs"] = len(beads)
+
+    return bead_frame(source_df, target_df, source_start, target_start, beads)
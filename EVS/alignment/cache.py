@@ -0,0 +1,102 @@
+import hashlib
+import os
+import re
+import sqlite3
+import time
+import unicodedata
+
+import numpy as np
+
+def normalize_sentence(sentence):
+    return re.sub(r'\s+', ' ', unicodedata.normalize('NFC', sentence)).strip()
+
+def cache_key(model_id, revision, language, sentence):
+    text = "\x1f".join([model_id, revision, language or "", normalize_sentence(sentence)])
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+class EmbeddingCache:
+    # Content-addressed SQLite store of float32 vectors, bounded by size with
+    # least-recently-used eviction. Several worker processes can share one file.
+
+    def __init__(self, path, max_bytes=1024 * 1024 * 1024):
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.connection = sqlite3.connect(path, timeout=60)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, dimensions INTEGER, vector BLOB, size INTEGER, last_used REAL)"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self.connection.commit()
+
+    def get_many(self, keys):
+        found = {}
+        now = time.time()
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self.connection.execute(
+                f"SELECT key, dimensions, vector FROM embeddings WHERE key IN ({placeholders})", chunk
+            ).fetchall()
+            for key, dimensions, vector in rows:
+                found[key] = np.frombuffer(vector, dtype=np.float32, count=dimensions)
+            self.connection.executemany(
+                "UPDATE embeddings SET last_used = ? WHERE key = ?", [(now, key) for key, _, _ in rows]
+            )
+        self.connection.commit()
+        return found
+
+    def put_many(self, items):
+        now = time.time()
+        rows = []
+        for key, vector in items:
+            blob = np.ascontiguousarray(vector, dtype=np.float32).tobytes()
+            rows.append((key, len(vector), blob, len(blob), now))
+        self.connection.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?, ?)", rows)
+        self.connection.commit()
+        self.evict()
+
+    def size(self):
+        return self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()[0]
+
+    def evict(self):
+        excess = self.size() - self.max_bytes
+        if excess <= 0:
+            return
+        rows = self.connection.execute("SELECT key, size FROM embeddings ORDER BY last_used").fetchall()
+        stale = []
+        for key, size in rows:
+            if excess <= 0:
+                break
+            stale.append((key,))
+            excess -= size
+        self.connection.executemany("DELETE FROM embeddings WHERE key = ?", stale)
+        self.connection.commit()
+
+    def encode(self, encoder, sentences, language=None):
+        # Only sentences missing from the cache reach the encoder, and the model
+        # is not loaded at all when every sentence is already cached. The model
+        # identity is read once, since resolving it touches the filesystem.
+        model_id, revision = encoder.model_id, encoder.revision
+        keys = [cache_key(model_id, revision, language, s) for s in sentences]
+        found = self.get_many(list(set(keys)))
+
+        missing = {}
+        for key, sentence in zip(keys, sentences):
+            if key not in found and key not in missing:
+                missing[key] = sentence
+        if missing:
+            vectors = np.asarray(encoder.embed_batched(list(missing.values()), language), dtype=np.float32)
+            new_items = list(zip(missing.keys(), vectors))
+            self.put_many(new_items)
+            found.update(new_items)
+
+        if not keys:
+            return np.zeros((0, 0), dtype=np.float32)
+        return np.stack([found[key] for key in keys])
+
+    def close(self):
+        self.connection.close()
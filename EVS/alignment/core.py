@@ -0,0 +1,231 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from ..profiling import pop_profile_options, profiled, stage
+from ..stage_cache import memoized, stage_key, table_digest
+from ..SBD.srt import str_to_ms
+from ..SBD.table import read_sentences, table_extensions, write_sentences
+from .cache import EmbeddingCache
+from .dtw import dtw_path, sakoe_chiba_window, similarity_matrix, time_window_bounds, windowed_path
+from .encoders import get_encoder
+
+alignment_columns = ['sequence', 'source_sentence', 'target_sentence', 'source_start', 'target_start', 'EVS', 'EVS_ms']
+
+# "dtw" pairs sentences one to one along the DTW path; "anchors" also keeps
+# sentences the interpreter merged or split (see anchors.py)
+aligners = ("dtw", "anchors")
+
+def time_to_ms(time):
+    return str_to_ms(time)
+
+def time_difference(time1, time2):
+    # Signed: negative when the second time comes first, e.g. when the
+    # interpreter anticipates the speaker
+    return (time_to_ms(time2) - time_to_ms(time1)) / 1000
+
+def ms_to_time(ms):
+    sign = "-" if ms < 0 else ""
+    seconds, milliseconds = divmod(abs(int(ms)), 1000)
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{sign}{hours:02d}:{minutes:02d}:{seconds:02d},{milliseconds:03d}"
+
+def seconds_to_time(seconds):
+    return ms_to_time(round(seconds * 1000))
+
+def cosine_similarity(x, y):
+    return np.dot(x, y) / (np.linalg.norm(x) * np.linalg.norm(y))
+
+def to_milliseconds(times):
+    # "HH:MM:SS,mmm" strings to int64 milliseconds in one vectorized pass
+    return (pd.to_timedelta(pd.Series(times).str.replace(',', '.', regex=False)) // pd.Timedelta(milliseconds=1)).to_numpy(np.int64)
+
+def start_milliseconds(sentences_df):
+    # Frames read from a sentence table already carry int64 start times
+    if 'start_ms' in sentences_df:
+        return sentences_df['start_ms'].to_numpy(np.int64)
+    return to_milliseconds(sentences_df['start'])
+
+def start_times(sentences_df, start, idx):
+    if 'start' in sentences_df:
+        return sentences_df['start'].to_numpy()[idx]
+    return [ms_to_time(ms) for ms in start[idx]]
+
+def alignment_path(source_df, target_df, source_embeddings, target_embeddings, band=None, time_window=None):
+    # The DTW path as an (n, 2) array of sentence indices, the cosine
+    # similarity of every pair on it, and the start times in milliseconds
+    source_start = start_milliseconds(source_df)
+    target_start = start_milliseconds(target_df)
+    if time_window is not None:
+        # Only target sentences starting within (before, after) seconds of the
+        # source sentence are considered
+        before, after = time_window
+        lo, hi = time_window_bounds(source_start, target_start, before * 1000, after * 1000)
+        _, path, path_similarity = windowed_path(source_embeddings, target_embeddings, lo, hi)
+    elif band is not None:
+        lo, hi = sakoe_chiba_window(len(source_df), len(target_df), band)
+        _, path, path_similarity = windowed_path(source_embeddings, target_embeddings, lo, hi)
+    else:
+        similarity = similarity_matrix(source_embeddings, target_embeddings)
+        _, path = dtw_path(similarity)
+        path_similarity = similarity[tuple(np.array(path).T)]
+    return np.array(path, dtype=np.intp).reshape(-1, 2), np.asarray(path_similarity), source_start, target_start
+
+def accept_pairs(path, path_similarity, similarity_threshold):
+    # The path is monotone, so a sentence already used can only be the one
+    # accepted last
+    accepted = []
+    used_source = used_target = -1
+    for (source_idx, target_idx), pair_similarity in zip(path.tolist(), path_similarity.tolist()):
+        if source_idx == used_source or target_idx == used_target:
+            continue
+        if pair_similarity >= similarity_threshold:
+            accepted.append((source_idx, target_idx))
+            used_source, used_target = source_idx, target_idx
+    return accepted
+
+def align_embeddings(source_df, target_df, source_embeddings, target_embeddings, similarity_threshold, band=None, time_window=None):
+    if len(source_df) == 0 or len(target_df) == 0:
+        return pd.DataFrame(columns=alignment_columns)
+
+    with stage("dtw") as counts:
+        path, path_similarity, source_start, target_start = alignment_path(
+            source_df, target_df, source_embeddings, target_embeddings, band, time_window)
+        accepted = accept_pairs(path, path_similarity, similarity_threshold)
+        counts["sentences"] = len(source_df) + len(target_df)
+        counts["pairs"] = len(accepted)
+
+    return aligned_frame(source_df, target_df, source_start, target_start, accepted)
+
+def align_pair(source_df, target_df, source_embeddings, target_embeddings, similarity_threshold, band=None, time_window=None, aligner="dtw"):
+    if aligner == "anchors":
+        from .anchors import align_anchored
+        return align_anchored(source_df, target_df, source_embeddings, target_embeddings, similarity_threshold, time_window)
+    return align_embeddings(source_df, target_df, source_embeddings, target_embeddings, similarity_threshold, band, time_window)
+
+def aligned_frame(source_df, target_df, source_start, target_start, accepted):
+    # Builds every output column for the accepted pairs in one pass;
+    # EVS is target start minus source start, in signed milliseconds
+    if not accepted:
+        return pd.DataFrame(columns=alignment_columns)
+    source_idx, target_idx = np.array(accepted, dtype=np.intp).T
+    evs_ms = target_start[target_idx] - source_start[source_idx]
+    return pd.DataFrame({
+        'sequence': np.arange(1, len(evs_ms) + 1),
+        'source_sentence': source_df['sentence'].to_numpy()[source_idx],
+        'target_sentence': target_df['sentence'].to_numpy()[target_idx],
+        'source_start': start_times(source_df, source_start, source_idx),
+        'target_start': start_times(target_df, target_start, target_idx),
+        'EVS': [ms_to_time(ms) for ms in evs_ms],
+        'EVS_ms': evs_ms,
+    })
+
+def embedding_model(encoder, language):
+    return f"{encoder.model_id}@{encoder.revision}/{language or ''}"
+
+def table_embeddings(table, table_file, encoder, language):
+    # Embeddings stored in a columnar sentence table are reused when they
+    # come from the same model, revision and language; otherwise they are
+    # computed and written back so the next run can skip the encoder
+    model = embedding_model(encoder, language)
+    if table.embeddings is not None and table.embedding_model == model:
+        return table.embeddings
+    embeddings = encoder.encode(table.sentences, language)
+    if not table_file.endswith(".csv"):
+        table.embeddings, table.embedding_model = embeddings, model
+        write_sentences(table_file, table)
+    return embeddings
+
+def encoding_inputs(table, encoder, language):
+    # The stage cache key of a table's embeddings: its sentences and times,
+    # the model, its weights and the installed library versions
+    return {"sentences": table_digest(table), "model": embedding_model(encoder, language), "encoder": encoder.fingerprint()}
+
+def alignment_inputs(source_key, target_key, similarity_threshold, band=None, time_window=None, aligner="dtw"):
+    # The stage cache key of an alignment: the encoding keys of both sides and the alignment parameters
+    return {"source": source_key, "target": target_key, "similarity_threshold": similarity_threshold,
+            "band": band, "time_window": list(time_window) if time_window else None, "aligner": aligner}
+
+def align_sentences(source_file, target_file, output_file, similarity_threshold, encoder, source_lang=None, target_lang=None, band=None, time_window=None, aligner="dtw", stage_cache=None):
+    # With a stage cache, an alignment of the same sentences with the same
+    # model and parameters is read back without encoding anything
+    source = read_sentences(source_file)
+    target = read_sentences(target_file)
+
+    def embeddings(table, table_file, language):
+        return memoized(stage_cache, "encoding", lambda: encoding_inputs(table, encoder, language),
+                        lambda: table_embeddings(table, table_file, encoder, language), np.load, np.save)[0]
+
+    def align():
+        source_embeddings = embeddings(source, source_file, source_lang)
+        target_embeddings = embeddings(target, target_file, target_lang)
+        return align_pair(source.to_frame(), target.to_frame(), source_embeddings, target_embeddings, similarity_threshold, band, time_window, aligner)
+
+    aligned_df, _ = memoized(stage_cache, "alignment",
+                             lambda: alignment_inputs(stage_key("encoding", encoding_inputs(source, encoder, source_lang)),
+                                                      stage_key("encoding", encoding_inputs(target, encoder, target_lang)),
+                                                      similarity_threshold, band, time_window, aligner),
+                             align, read_alignment, write_alignment)
+    write_alignment(output_file, aligned_df)
+    return output_file
+
+def write_alignment(output_file, aligned_df):
+    with stage("write") as counts:
+        aligned_df.to_csv(output_file, index=False)
+        counts["pairs"] = len(aligned_df)
+    return output_file
+
+def read_alignment(alignment_file):
+    # Texts and times are kept as written, so writing the frame again gives the same file
+    aligned_df = pd.read_csv(alignment_file, dtype=str, keep_default_na=False)
+    return aligned_df.astype({'sequence': np.int64, 'EVS_ms': np.int64})
+
+def align_directories(source_path, target_path, output_directory, similarity_threshold, encoder, source_lang=None, target_lang=None, band=None, time_window=None, aligner="dtw", stage_cache=None):
+    # Accepts either two sentence files or two directories whose sentence
+    # files (.csv, .npz or .parquet) pair up in sorted order
+    if os.path.isfile(source_path):
+        source_files, target_files = [source_path], [target_path]
+    else:
+        source_files = [os.path.join(source_path, f) for f in sorted(os.listdir(source_path)) if f.endswith(table_extensions)]
+        target_files = [os.path.join(target_path, f) for f in sorted(os.listdir(target_path)) if f.endswith(table_extensions)]
+        if len(source_files) != len(target_files):
+            print(f"Found {len(source_files)} source and {len(target_files)} target files; they must pair up.")
+            sys.exit(1)
+
+    os.makedirs(output_directory, exist_ok=True)
+    output_files = []
+    for source_file, target_file in zip(source_files, target_files):
+        name = os.path.splitext(os.path.basename(source_file))[0]
+        output_file = os.path.join(output_directory, f"{name}_Alignment_EVS.csv")
+        output_files.append(align_sentences(source_file, target_file, output_file, similarity_threshold, encoder, source_lang, target_lang, band, time_window, aligner,
+                                            stage_cache))
+    return output_files
+
+def run_cli(encoder_name, argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    command = [encoder_name] + argv
+    argv, report_file, dump_stage = pop_profile_options(argv)
+    if "--onnx" in argv:
+        # The int8 ONNX Runtime export of the same model
+        argv = [argument for argument in argv if argument != "--onnx"]
+        encoder_name = f"{encoder_name}_onnx"
+    if len(argv) < 5:
+        print("Usage: <source_file.csv> <target_file.csv> <source_language> <target_language> <similarity_threshold> [--onnx]")
+        sys.exit(1)
+
+    source_file = argv[0]
+    target_file = argv[1]
+    source_lang = argv[2]
+    target_lang = argv[3]
+    similarity_threshold = float(argv[4])
+    output_file = 'Alignment_EVS.csv'
+
+    # Set EVS_EMBEDDING_CACHE to a file path to reuse embeddings across runs
+    cache_path = os.environ.get("EVS_EMBEDDING_CACHE")
+    cache = EmbeddingCache(cache_path) if cache_path else None
+
+    with profiled(report_file, dump_stage, command):
+        align_sentences(source_file, target_file, output_file, similarity_threshold, get_encoder(encoder_name, cache), source_lang, target_lang)
@@ -0,0 +1,137 @@
+import numpy as np
+
+def normalize(embeddings):
+    embeddings = np.asarray(embeddings, dtype=np.float64)
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return embeddings / norms
+
+def similarity_matrix(source_embeddings, target_embeddings):
+    # Cosine similarity of every source/target pair in one matmul
+    return normalize(source_embeddings) @ normalize(target_embeddings).T
+
+def full_window(n, m):
+    return np.zeros(n, dtype=np.int64), np.full(n, m, dtype=np.int64)
+
+def sakoe_chiba_window(n, m, radius):
+    # Band of +-radius columns around the diagonal of the n x m grid; the radius
+    # is widened to the grid's slope so that neighbouring rows always connect
+    radius = max(radius, int(np.ceil(m / max(n, 1))))
+    centers = np.arange(n) * ((m - 1) / max(n - 1, 1))
+    lo = np.clip(np.floor(centers - radius), 0, m - 1).astype(np.int64)
+    hi = np.clip(np.ceil(centers + radius) + 1, 1, m).astype(np.int64)
+    lo[0] = 0
+    hi[-1] = m
+    return lo, hi
+
+def dtw(cost, lo, hi):
+    # Exact DTW restricted to columns [lo[i], hi[i]) of every row. Each row is
+    # solved with whole-array operations: unrolling the horizontal step gives
+    # D[i, j] = C[j] + min_{k <= j} (A[k] - C[k - 1]), with C the running sum
+    # of the row's costs and A[k] the best diagonal/vertical predecessor.
+    n = len(lo)
+    rows = []
+    prev = None
+    prev_lo = prev_hi = 0
+    for i in range(n):
+        row_cost = cost(i, lo[i], hi[i])
+        if prev is None:
+            best_prev = np.full(hi[i] - lo[i], np.inf)
+            if lo[i] == 0:
+                best_prev[0] = 0.0
+        else:
+            above = shifted(prev, prev_lo, prev_hi, lo[i], hi[i])
+            diagonal = shifted(prev, prev_lo + 1, prev_hi + 1, lo[i], hi[i])
+            best_prev = np.minimum(above, diagonal)
+        running = np.cumsum(row_cost)
+        row = running + np.minimum.accumulate(best_prev - (running - row_cost))
+        if not np.isfinite(row).any():
+            raise ValueError(f"DTW window leaves row {i} unreachable")
+        rows.append(row)
+        prev, prev_lo, prev_hi = row, lo[i], hi[i]
+
+    if not np.isfinite(rows[-1][-1]):
+        raise ValueError("DTW window does not reach the final cell")
+    return rows[-1][-1], backtrack(rows, lo, hi)
+
+def shifted(row, row_lo, row_hi, lo, hi):
+    # Values of `row` (covering columns [row_lo, row_hi)) at columns [lo, hi)
+    values = np.full(hi - lo, np.inf)
+    start = max(lo, row_lo)
+    stop = min(hi, row_hi)
+    if start < stop:
+        values[start - lo:stop - lo] = row[start - row_lo:stop - row_lo]
+    return values
+
+def cell(rows, lo, hi, i, j):
+    if i < 0 or j < lo[i] or j >= hi[i]:
+        return np.inf
+    return rows[i][j - lo[i]]
+
+def backtrack(rows, lo, hi):
+    i = len(rows) - 1
+    j = hi[i] - 1
+    path = [(i, j)]
+    while i > 0 or j > 0:
+        diagonal = cell(rows, lo, hi, i - 1, j - 1)
+        above = cell(rows, lo, hi, i - 1, j)
+        left = cell(rows, lo, hi, i, j - 1)
+        if diagonal <= above and diagonal <= left:
+            i, j = i - 1, j - 1
+        elif above <= left:
+            i -= 1
+        else:
+            j -= 1
+        path.append((i, j))
+    path.reverse()
+    return path
+
+def dtw_path(similarity, band=None):
+    # Cosine distance over the precomputed similarity matrix; `band` is an
+    # optional Sakoe-Chiba radius in sentences
+    n, m = similarity.shape
+    lo, hi = full_window(n, m) if band is None else sakoe_chiba_window(n, m, band)
+    distance, path = dtw(lambda i, start, stop: 1.0 - similarity[i, start:stop], lo, hi)
+    return distance, path
+
+def time_window_bounds(source_start, target_start, before, after):
+    lo, hi = window_ranges(source_start, target_start, before, after)
+    return connect_window(lo, hi, len(target_start))
+
+def window_ranges(source_start, target_start, before, after):
+    # Columns whose target start lies in [source start - before, source start + after],
+    # found with a two-pointer sweep over the sorted start times; rows may be empty
+    n = len(source_start)
+    m = len(target_start)
+    lo = np.empty(n, dtype=np.int64)
+    hi = np.empty(n, dtype=np.int64)
+    first = last = 0
+    for i in range(n):
+        while first < m and target_start[first] < source_start[i] - before:
+            first += 1
+        last = max(last, first)
+        while last < m and target_start[last] <= source_start[i] + after:
+            last += 1
+        lo[i] = first
+        hi[i] = last
+    return lo, hi
+
+def connect_window(lo, hi, m):
+    # Widen the window just enough for a monotonic path from (0, 0) to the
+    # last cell: no empty rows, and every row overlapping the previous one
+    lo = np.minimum(lo, m - 1)
+    hi = np.maximum.accumulate(np.maximum(hi, lo + 1))
+    lo[0] = 0
+    hi[-1] = m
+    lo[1:] = np.minimum(lo[1:], hi[:-1])
+    return lo, hi
+
+def windowed_path(source_embeddings, target_embeddings, lo, hi):
+    # Similarities are only computed inside the window, so the work grows with
+    # the number of candidate cells rather than with the full grid
+    source = normalize(source_embeddings)
+    target = normalize(target_embeddings)
+    distance, path = dtw(lambda i, start, stop: 1.0 - target[start:stop] @ source[i], lo, hi)
+    indices = np.array(path)
+    path_similarity = np.einsum('ij,ij->i', source[indices[:, 0]], target[indices[:, 1]])
+    return distance, path, path_similarity
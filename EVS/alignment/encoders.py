@@ -0,0 +1,254 @@
+import os
+import shutil
+import subprocess
+import sys
+
+import numpy as np
+
+from ..models import installed_versions
+from ..profiling import stage
+from ..registry import resolve
+
+# Encoders import their framework and load weights on first use, so one
+# instance can embed many files without reloading the model. Sentences are
+# embedded in length-sorted batches of `batch_size`, so padding stays small
+# and peak memory is bounded by one batch rather than the whole session.
+
+class Encoder:
+    name = None
+    # Appended to the revision when the vectors are not the plain model's,
+    # e.g. with another pooling
+    variant = None
+    # Distributions whose versions decide the vectors, e.g. the framework and its model library
+    packages = ()
+
+    def __init__(self, cache=None, batch_size=32, model_dir=None):
+        self.model = None
+        self.cache = cache
+        self.batch_size = batch_size
+        self.model_dir = model_dir
+        self.resolved_revision = None
+
+    @property
+    def model_id(self):
+        # A pinned copy is a model of its own, so its vectors never mix with the hub model's
+        if self.model_dir:
+            return os.path.abspath(self.model_dir)
+        return getattr(self, 'model_name', None) or getattr(self, 'model_url', None) or self.name
+
+    @property
+    def revision(self):
+        # Part of the embedding cache key, of the stage fingerprints and of
+        # the model stamp on stored tables. Resolving it touches the
+        # filesystem, so it is kept until the model is loaded again.
+        if self.resolved_revision is None:
+            self.resolved_revision = self.resolve_revision()
+        return self.resolved_revision
+
+    def resolve_revision(self):
+        # A digest of the pinned copy's files, otherwise the version of the
+        # hub weights in the local cache. Weights that have not been
+        # downloaded yet are loaded first, so that the first run's vectors are
+        # keyed by the same revision as the runs after it. 'main' stands for
+        # weights that no hub cache records.
+        from ..models import hugging_face_commit, path_digest, tf_hub_digest
+        if self.model_dir:
+            revision = path_digest(self.model_dir)
+        elif getattr(self, 'model_name', None):
+            revision = hugging_face_commit(self.model_name)
+            if revision is None and self.model is None:
+                self.ready()
+                revision = hugging_face_commit(self.model_name)
+        elif getattr(self, 'model_url', None):
+            revision = tf_hub_digest(self.model_url)
+            if revision is None and self.model is None:
+                self.ready()
+                revision = tf_hub_digest(self.model_url)
+        else:
+            revision = None
+        revision = revision or 'main'
+        return f"{revision}-{self.variant}" if self.variant else revision
+
+    @property
+    def source(self):
+        # Where the weights are loaded from: the pinned local copy if there is one
+        return self.model_dir or getattr(self, 'model_name', None) or getattr(self, 'model_url', None)
+
+    def fingerprint(self):
+        # Everything besides the sentences that the vectors depend on; part
+        # of the encoding key of the stage cache
+        return {
+            'alignment': self.name,
+            'model': self.model_id,
+            'revision': self.revision,
+            'source': self.source or '',
+            'versions': installed_versions(self.packages),
+        }
+
+    def load(self):
+        raise NotImplementedError
+
+    def fetch(self, directory):
+        # Saves the model files under `directory` so they can be pinned in
+        # the model store and loaded offline from then on
+        raise NotImplementedError(f"The {self.name} encoder has no model files to fetch")
+
+    def embed(self, sentences, language):
+        raise NotImplementedError
+
+    def ready(self):
+        if self.model is None:
+            with stage("encoder_model_load"):
+                self.model = self.load()
+            # Loading may download the weights or write the pinned copy
+            self.resolved_revision = None
+        return self
+
+    def embed_batched(self, sentences, language):
+        self.ready()
+        order = sorted(range(len(sentences)), key=lambda i: len(sentences[i]))
+        batches = []
+        for start in range(0, len(order), self.batch_size):
+            batch = [sentences[i] for i in order[start:start + self.batch_size]]
+            batches.append(np.asarray(self.embed(batch, language)))
+        if not batches:
+            return np.zeros((0, 0), dtype=np.float32)
+        embeddings = np.empty((len(sentences), batches[0].shape[1]), dtype=batches[0].dtype)
+        embeddings[order] = np.concatenate(batches)
+        return embeddings
+
+    def encode(self, sentences, language=None):
+        with stage("encoding") as counts:
+            counts["sentences"] = len(sentences)
+            if self.cache is not None:
+                return self.cache.encode(self, sentences, language)
+            return self.embed_batched(sentences, language)
+
+class LaserEncoder(Encoder):
+    name = 'LASER'
+    packages = ('laserembeddings', 'torch')
+
+    model_files = ('93langs.fcodes', '93langs.fvocab', 'bilstm.93langs.2018-12-26.pt')
+
+    def load(self):
+        from laserembeddings import Laser
+        if self.model_dir:
+            return Laser(*(os.path.join(self.model_dir, name) for name in self.model_files))
+        return Laser()
+
+    def fetch(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        subprocess.run([sys.executable, '-m', 'laserembeddings', 'download-models', directory], check=True)
+
+    def embed(self, sentences, language):
+        return np.array(self.model.embed_sentences(sentences, lang=language))
+
+class SBERTEncoder(Encoder):
+    name = 'SBERT'
+    model_name = 'sentence-transformers/paraphrase-xlm-r-multilingual-v1'
+    packages = ('sentence-transformers', 'transformers', 'torch')
+
+    def load(self):
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(self.source)
+
+    def fetch(self, directory):
+        from sentence_transformers import SentenceTransformer
+        SentenceTransformer(self.model_name).save(directory)
+
+    def embed(self, sentences, language):
+        return self.model.encode(sentences, batch_size=len(sentences))
+
+class USEEncoder(Encoder):
+    name = 'USE'
+    model_url = "https://tfhub.dev/google/universal-sentence-encoder-multilingual/3"
+    packages = ('tensorflow', 'tensorflow-hub', 'tensorflow-text')
+
+    def load(self):
+        import tensorflow_hub as hub
+        import tensorflow_text
+        return hub.load(self.source)
+
+    def fetch(self, directory):
+        # hub.resolve downloads the SavedModel into the TF Hub cache
+        import tensorflow_hub as hub
+        shutil.copytree(hub.resolve(self.model_url), directory)
+
+    def embed(self, sentences, language):
+        return np.array(self.model(sentences))
+
+class XLMRobertaEncoder(Encoder):
+    name = 'XLM_Roberta'
+    model_name = 'xlm-roberta-base'
+    packages = ('transformers', 'torch')
+
+    def load(self):
+        from transformers import XLMRobertaModel, XLMRobertaTokenizer
+        tokenizer = XLMRobertaTokenizer.from_pretrained(self.source)
+        model = XLMRobertaModel.from_pretrained(self.source)
+        return tokenizer, model
+
+    def fetch(self, directory):
+        from transformers import XLMRobertaModel, XLMRobertaTokenizer
+        XLMRobertaTokenizer.from_pretrained(self.model_name).save_pretrained(directory)
+        XLMRobertaModel.from_pretrained(self.model_name).save_pretrained(directory)
+
+    def embed(self, sentences, language):
+        import torch
+        tokenizer, model = self.model
+        inputs = tokenizer(sentences, return_tensors="pt", padding=True, truncation=True)
+        with torch.inference_mode():
+            outputs = model(**inputs)
+        return outputs.last_hidden_state[:, 0, :].numpy()
+
+class MT5Encoder(Encoder):
+    name = 'mT5'
+    model_name = 'google/mt5-small'
+    packages = ('transformers', 'torch', 'sentencepiece')
+    # Embeddings are mask-aware mean pools of the encoder states; the variant
+    # keeps them apart from cached vectors of the earlier unmasked pooling
+    variant = 'masked-mean'
+
+    def load(self):
+        # Only the encoder half of mT5 is needed for sentence embeddings
+        from transformers import T5Tokenizer, MT5EncoderModel
+        tokenizer = T5Tokenizer.from_pretrained(self.source)
+        model = MT5EncoderModel.from_pretrained(self.source)
+        model.eval()
+        return tokenizer, model
+
+    def fetch(self, directory):
+        from transformers import T5Tokenizer, MT5EncoderModel
+        T5Tokenizer.from_pretrained(self.model_name).save_pretrained(directory)
+        MT5EncoderModel.from_pretrained(self.model_name).save_pretrained(directory)
+
+    def embed(self, sentences, language):
+        import torch
+        tokenizer, model = self.model
+        inputs = tokenizer(sentences, return_tensors="pt", padding=True, truncation=True, max_length=512)
+        with torch.inference_mode():
+            hidden = model(**inputs).last_hidden_state
+            mask = inputs["attention_mask"].unsqueeze(-1).to(hidden.dtype)
+            embeddings = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1)
+        return embeddings.numpy()
+
+def create_encoder(name, cache=None, batch_size=32, model_dir=None):
+    # A local encoder; model_dir defaults to the copy pinned in the model store
+    encoder_class = resolve('alignment', name)
+    if model_dir is None:
+        from ..models import pinned_path
+        model_dir = pinned_path('alignment', name)
+    return encoder_class(cache, batch_size, model_dir)
+
+def get_encoder(name, cache=None, batch_size=32, model_dir=None):
+    # With EVS_MODEL_SERVER set, the model stays loaded in that server instead
+    try:
+        address = os.environ.get('EVS_MODEL_SERVER')
+        if address:
+            resolve('alignment', name)
+            from ..server import RemoteEncoder
+            return RemoteEncoder(name, address, cache, batch_size)
+        return create_encoder(name, cache, batch_size, model_dir)
+    except KeyError as e:
+        print(e.args[0])
+        sys.exit(1)
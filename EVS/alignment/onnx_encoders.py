@@ -0,0 +1,142 @@
+import json
+import os
+
+import numpy as np
+
+from .encoders import Encoder, MT5Encoder, SBERTEncoder, XLMRobertaEncoder
+
+# CPU variants of the PyTorch encoders: the model and its pooling are
+# exported once to ONNX, the weights are quantized to int8, and sentences
+# are tokenized by the Rust `tokenizers` library. Embedding needs only
+# onnxruntime and tokenizers; the export also needs torch, transformers and
+# onnx. The embeddings are close to, but not the same as, the fp32 ones, so
+# they carry their own revision variant and never mix with fp32 vectors in the
+# embedding cache or in stored sentence tables.
+
+default_export_directory = os.path.join(os.path.expanduser("~"), ".cache", "evs", "onnx")
+
+model_file = "model.int8.onnx"
+
+def pooled_module(model, pooling):
+    # The encoder followed by its sentence pooling, so that the exported
+    # graph returns one embedding per sentence
+    import torch
+
+    class PooledModel(torch.nn.Module):
+        def __init__(self):
+            super().__init__()
+            self.model = model
+
+        def forward(self, input_ids, attention_mask):
+            hidden = self.model(input_ids=input_ids, attention_mask=attention_mask).last_hidden_state
+            if pooling == "cls":
+                return hidden[:, 0, :]
+            mask = attention_mask.unsqueeze(-1).to(hidden.dtype)
+            return (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1)
+
+    return PooledModel().eval()
+
+class OnnxEncoder(Encoder):
+    # `fp32` is the PyTorch backend the model is exported from; its pinned
+    # copy, if any, is the source of the weights
+    fp32 = None
+    pooling = "mean"
+    packages = ('onnxruntime', 'tokenizers')
+    max_length = 512
+
+    def pytorch_model(self, source):
+        # A fast tokenizer and the torch module whose last_hidden_state is pooled
+        raise NotImplementedError
+
+    def load(self):
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        directory = self.model_dir or os.path.join(default_export_directory, self.name)
+        if not os.path.exists(os.path.join(directory, model_file)):
+            self.fetch(directory)
+        tokenizer = Tokenizer.from_file(os.path.join(directory, "tokenizer.json"))
+        options = onnxruntime.SessionOptions()
+        # Follows the thread limit that batch workers set
+        options.intra_op_num_threads = int(os.environ.get("OMP_NUM_THREADS", 0))
+        session = onnxruntime.InferenceSession(os.path.join(directory, model_file), options,
+                                               providers=["CPUExecutionProvider"])
+        return tokenizer, session
+
+    def fetch(self, directory):
+        # Exports and quantizes the model into `directory`; the fp32 graph
+        # is only an intermediate step and is removed
+        import torch
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        from ..models import pinned_path
+
+        os.makedirs(directory, exist_ok=True)
+        source = pinned_path("alignment", self.fp32.name) or self.model_name
+        tokenizer, model = self.pytorch_model(source)
+
+        # Padding and truncation are stored with the tokenizer, so loading
+        # needs nothing but tokenizer.json
+        backend = tokenizer.backend_tokenizer
+        backend.enable_padding(pad_id=tokenizer.pad_token_id, pad_token=tokenizer.pad_token)
+        backend.enable_truncation(self.max_length)
+        backend.save(os.path.join(directory, "tokenizer.json"))
+
+        fp32_file = os.path.join(directory, "model.fp32.onnx")
+        sample = tokenizer(["A sentence to trace the graph with."], return_tensors="pt")
+        with torch.no_grad():
+            torch.onnx.export(pooled_module(model, self.pooling), (sample["input_ids"], sample["attention_mask"]), fp32_file,
+                              input_names=["input_ids", "attention_mask"], output_names=["embedding"],
+                              dynamic_axes={"input_ids": {0: "batch", 1: "tokens"}, "attention_mask": {0: "batch", 1: "tokens"},
+                                            "embedding": {0: "batch"}},
+                              opset_version=14)
+        quantize_dynamic(fp32_file, os.path.join(directory, model_file), weight_type=QuantType.QInt8)
+        os.remove(fp32_file)
+        with open(os.path.join(directory, "export.json"), "w", encoding="utf-8") as jsonfile:
+            json.dump({"source": source, "pooling": self.pooling, "max_length": self.max_length,
+                       "weights": "int8"}, jsonfile, indent=2)
+
+    def embed(self, sentences, language):
+        tokenizer, session = self.model
+        encodings = tokenizer.encode_batch(list(sentences))
+        inputs = {
+            "input_ids": np.array([encoding.ids for encoding in encodings], dtype=np.int64),
+            "attention_mask": np.array([encoding.attention_mask for encoding in encodings], dtype=np.int64),
+        }
+        return session.run(["embedding"], inputs)[0]
+
+class SBERTOnnxEncoder(OnnxEncoder):
+    name = 'SBERT_onnx'
+    fp32 = SBERTEncoder
+    model_name = SBERTEncoder.model_name
+    variant = 'onnx-int8'
+
+    def pytorch_model(self, source):
+        from sentence_transformers import SentenceTransformer
+
+        transformer, pooling = list(SentenceTransformer(source, device="cpu"))[:2]
+        if not pooling.pooling_mode_mean_tokens:
+            raise NotImplementedError(f"Only mean pooling is exported; {source} uses {pooling.get_pooling_mode_str()}")
+        self.max_length = transformer.max_seq_length
+        return transformer.tokenizer, transformer.auto_model.eval()
+
+class XLMRobertaOnnxEncoder(OnnxEncoder):
+    name = 'XLM_Roberta_onnx'
+    fp32 = XLMRobertaEncoder
+    model_name = XLMRobertaEncoder.model_name
+    variant = 'onnx-int8'
+    pooling = "cls"
+
+    def pytorch_model(self, source):
+        from transformers import XLMRobertaModel, XLMRobertaTokenizerFast
+        return XLMRobertaTokenizerFast.from_pretrained(source), XLMRobertaModel.from_pretrained(source).eval()
+
+class MT5OnnxEncoder(OnnxEncoder):
+    name = 'mT5_onnx'
+    fp32 = MT5Encoder
+    model_name = MT5Encoder.model_name
+    variant = f'{MT5Encoder.variant}-onnx-int8'
+
+    def pytorch_model(self, source):
+        from transformers import MT5EncoderModel, T5TokenizerFast
+        return T5TokenizerFast.from_pretrained(source), MT5EncoderModel.from_pretrained(source).eval()
@@ -0,0 +1,101 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from ..evaluation import match_reference, read_reference
+from ..profiling import stage
+from ..SBD.table import read_sentences
+from .core import alignment_path, table_embeddings
+
+# Scores a whole grid of similarity thresholds from one encoding and one DTW
+# path: only the acceptance of pairs along the path depends on the threshold.
+
+sweep_columns = ['threshold', 'aligned_pairs', 'mean_evs', 'median_evs', 'std_evs', 'p10_evs', 'p25_evs', 'p75_evs', 'p90_evs']
+
+reference_columns = ['matched_pairs', 'mae', 'rmse', 'mean_evs_error']
+
+def threshold_grid(start=0.3, stop=0.95, step=0.01):
+    # Inclusive of `stop`; rounded so that 0.3 + 5 * 0.01 prints as 0.35
+    return np.round(np.arange(start, stop + step / 2, step), 6)
+
+def accept_matrix(path, path_similarity, thresholds):
+    # The greedy acceptance of accept_pairs for every threshold at once: one
+    # walk along the path, with the last accepted pair kept per threshold.
+    # Entry [k, t] tells whether path pair k is accepted at thresholds[t].
+    thresholds = np.asarray(thresholds, dtype=float)
+    accepted = np.zeros((len(path), len(thresholds)), dtype=bool)
+    if len(thresholds) == 0:
+        return accepted
+    used_source = np.full(len(thresholds), -1, dtype=np.intp)
+    used_target = np.full(len(thresholds), -1, dtype=np.intp)
+    # Pairs below the lowest threshold are never accepted and leave the state as is
+    for k in np.flatnonzero(path_similarity >= thresholds.min()):
+        source_idx, target_idx = path[k]
+        accept = (path_similarity[k] >= thresholds) & (used_source != source_idx) & (used_target != target_idx)
+        accepted[k] = accept
+        used_source[accept] = source_idx
+        used_target[accept] = target_idx
+    return accepted
+
+def sweep_thresholds(source_df, target_df, source_embeddings, target_embeddings, thresholds, band=None, time_window=None, reference=None, tolerance_ms=1000):
+    # One row per threshold with the number of aligned pairs and the EVS
+    # distribution in seconds; with a `reference` of (start_ms, evs_ms) from
+    # read_reference, also the error against the matched manual EVS
+    thresholds = np.asarray(thresholds, dtype=float)
+    if len(source_df) == 0 or len(target_df) == 0:
+        path = np.zeros((0, 2), dtype=np.intp)
+        path_similarity = evs_ms = path_start = np.zeros(0)
+    else:
+        with stage("dtw") as counts:
+            path, path_similarity, source_start, target_start = alignment_path(
+                source_df, target_df, source_embeddings, target_embeddings, band, time_window)
+            counts["sentences"] = len(source_df) + len(target_df)
+        path_start = source_start[path[:, 0]]
+        evs_ms = target_start[path[:, 1]] - path_start
+
+    with stage("sweep") as counts:
+        accepted = accept_matrix(path, path_similarity, thresholds)
+        # Pairs not accepted at a threshold are NaN in its column
+        evs = np.where(accepted, evs_ms[:, None] / 1000, np.nan)
+        with warnings.catch_warnings():
+            # Thresholds that accept nothing give NaN statistics
+            warnings.simplefilter("ignore", RuntimeWarning)
+            percentiles = np.nanpercentile(evs, [10, 25, 75, 90], axis=0) if len(path) else np.full((4, len(thresholds)), np.nan)
+            summary = {
+                'threshold': thresholds,
+                'aligned_pairs': accepted.sum(axis=0),
+                'mean_evs': np.nanmean(evs, axis=0),
+                'median_evs': np.nanmedian(evs, axis=0),
+                'std_evs': np.nanstd(evs, axis=0),
+                'p10_evs': percentiles[0],
+                'p25_evs': percentiles[1],
+                'p75_evs': percentiles[2],
+                'p90_evs': percentiles[3],
+            }
+            if reference is not None:
+                reference_start, reference_evs = reference
+                match = match_reference(path_start, reference_start, tolerance_ms)
+                error = np.where((match >= 0)[:, None], evs - reference_evs[match][:, None] / 1000, np.nan)
+                summary['matched_pairs'] = (~np.isnan(error)).sum(axis=0)
+                summary['mae'] = np.nanmean(np.abs(error), axis=0)
+                summary['rmse'] = np.sqrt(np.nanmean(error ** 2, axis=0))
+                # The corpus-level figure: mean automatic minus mean manual EVS
+                summary['mean_evs_error'] = summary['mean_evs'] - (reference_evs.mean() / 1000 if len(reference_evs) else np.nan)
+        counts["thresholds"] = len(thresholds)
+        counts["pairs"] = len(path)
+
+    return pd.DataFrame(summary, columns=sweep_columns + (reference_columns if reference is not None else []))
+
+def sweep_sentences(source_file, target_file, encoder, thresholds, source_lang=None, target_lang=None, band=None, time_window=None, reference_file=None, tolerance=1.0):
+    # Reads and encodes the two sentence files once (stored embeddings are
+    # reused) and sweeps the thresholds over their alignment
+    source = read_sentences(source_file)
+    target = read_sentences(target_file)
+
+    source_embeddings = table_embeddings(source, source_file, encoder, source_lang)
+    target_embeddings = table_embeddings(target, target_file, encoder, target_lang)
+
+    reference = read_reference(reference_file) if reference_file else None
+    return sweep_thresholds(source.to_frame(), target.to_frame(), source_embeddings, target_embeddings, thresholds,
+                            band, time_window, reference, round(tolerance * 1000))
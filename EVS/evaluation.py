@@ -0,0 +1,290 @@
+import csv
+import os
+
+import numpy as np
+import pandas as pd
+
+from .SBD.srt import str_to_ms
+
+# Comparison of automatic EVS with a manual reference. A reference is a CSV
+# with one row per annotated sentence pair: `source_start` ("HH:MM:SS,mmm")
+# and either `EVS_ms` or `EVS`, in seconds or as a signed "HH:MM:SS,mmm"
+# time. A corrected *_Alignment_EVS.csv can therefore serve as a reference.
+
+alignment_suffix = "_Alignment_EVS.csv"
+
+pair_columns = ['backend', 'pair', 'aligned_pairs', 'reference_pairs', 'matched_pairs', 'mean_evs', 'median_evs',
+                'reference_mean_evs', 'reference_median_evs', 'mean_evs_error', 'mae', 'rmse']
+
+# Corpus metrics that get bootstrap confidence intervals. The mean EVS ones
+# compare the per-pair mean EVS, as in the README; the sentence ones pool
+# the matched sentence pairs of all pairs.
+interval_metrics = ['bias', 'mean_evs_mae', 'mean_evs_rmse', 'correlation', 'sentence_mae', 'sentence_rmse']
+
+corpus_columns = ['backend', 'pairs', 'missing_pairs', 'aligned_pairs', 'matched_pairs', 'mean_evs', 'reference_mean_evs'] + \
+    [column for metric in interval_metrics for column in (metric, f"{metric}_low", f"{metric}_high")]
+
+def evs_to_ms(evs):
+    evs = str(evs).strip()
+    if ":" in evs:
+        sign = -1 if evs.startswith("-") else 1
+        return sign * str_to_ms(evs.lstrip("+-"))
+    return round(float(evs) * 1000)
+
+def times_to_ms(times):
+    # Signed "HH:MM:SS,mmm" strings to int64 milliseconds. The canonical
+    # layout is decoded from fixed-width bytes for all rows at once; any
+    # other row falls back to evs_to_ms.
+    times = list(times)
+    try:
+        raw = np.array(times, dtype="S14").view(np.uint8).reshape(-1, 14)
+    except UnicodeEncodeError:
+        return np.array([evs_to_ms(time) for time in times], dtype=np.int64)
+    negative = raw[:, 0] == ord("-")
+    text = np.where(negative[:, None], raw[:, 1:14], raw[:, 0:13])
+    digits = text[:, [0, 1, 3, 4, 6, 7, 9, 10, 11]].astype(np.int64) - ord("0")
+    canonical = ((digits >= 0) & (digits <= 9)).all(axis=1) & (text[:, 2] == ord(":")) & (text[:, 5] == ord(":")) \
+        & ((text[:, 8] == ord(",")) | (text[:, 8] == ord("."))) & (text[:, 12] == 0)
+    ms = (((digits[:, 0] * 10 + digits[:, 1]) * 60 + digits[:, 2] * 10 + digits[:, 3]) * 60
+          + digits[:, 4] * 10 + digits[:, 5]) * 1000 + digits[:, 6] * 100 + digits[:, 7] * 10 + digits[:, 8]
+    ms = np.where(negative, -ms, ms)
+    for i in np.flatnonzero(~canonical):
+        ms[i] = evs_to_ms(times[i])
+    return ms
+
+def evs_column_to_ms(values, column):
+    if column == "EVS_ms":
+        return np.array(values, dtype=np.int64)
+    try:
+        return np.round(np.array(values, dtype=float) * 1000).astype(np.int64)
+    except ValueError:
+        return times_to_ms(values)
+
+def read_evs(file_path):
+    # The source start and EVS fields of an alignment output or a reference,
+    # as strings, and the name of the EVS column. Rows with a blank EVS cell
+    # have no value to compare and are left out, like unannotated sentences.
+    with open(file_path, encoding="utf-8-sig", newline="") as csvfile:
+        reader = csv.reader(csvfile)
+        header = next(reader, [])
+        column = "EVS_ms" if "EVS_ms" in header else "EVS"
+        if "source_start" not in header or column not in header:
+            raise ValueError(f"{file_path} needs a source_start column and an EVS_ms or EVS column")
+        start, evs = header.index("source_start"), header.index(column)
+        rows = [(row[start], row[evs]) for row in reader if row and row[evs].strip()]
+    starts = [row[0] for row in rows]
+    values = [row[1] for row in rows]
+    return starts, values, column
+
+def read_reference(reference_file):
+    # Reference start times and EVS as int64 milliseconds, sorted by start
+    starts, values, column = read_evs(reference_file)
+    start_ms = times_to_ms(starts)
+    evs_ms = evs_column_to_ms(values, column)
+    order = np.argsort(start_ms, kind="stable")
+    return start_ms[order], evs_ms[order]
+
+def match_reference(start_ms, reference_start_ms, tolerance_ms=1000):
+    # For every automatic pair, the reference row whose source start is
+    # nearest to its own, or -1 when none is within the tolerance.
+    # `reference_start_ms` must be sorted.
+    start_ms = np.asarray(start_ms, dtype=np.int64)
+    if len(reference_start_ms) == 0:
+        return np.full(len(start_ms), -1, dtype=np.intp)
+    if len(reference_start_ms) == 1:
+        left = right = np.zeros(len(start_ms), dtype=np.intp)
+    else:
+        right = np.clip(np.searchsorted(reference_start_ms, start_ms), 1, len(reference_start_ms) - 1)
+        left = right - 1
+    nearest = np.where(np.abs(reference_start_ms[left] - start_ms) <= np.abs(reference_start_ms[right] - start_ms), left, right)
+    return np.where(np.abs(reference_start_ms[nearest] - start_ms) <= tolerance_ms, nearest, -1)
+
+def pair_name(file_name):
+    if file_name.endswith(alignment_suffix):
+        return file_name[:-len(alignment_suffix)]
+    return os.path.splitext(file_name)[0]
+
+def list_pairs(directory):
+    # Pair name to file: `<name>_Alignment_EVS.csv` or `<name>.csv`
+    return {pair_name(f): os.path.join(directory, f) for f in sorted(os.listdir(directory)) if f.endswith(".csv")}
+
+class EvsCorpus:
+    # The EVS rows of many pairs as columns: the pair index into `pairs`,
+    # int64 source start and EVS in milliseconds, sorted by pair and start
+
+    def __init__(self, pairs, pair, start_ms, evs_ms):
+        self.pairs = list(pairs)
+        self.pair = np.asarray(pair, dtype=np.intp)
+        self.start_ms = np.asarray(start_ms, dtype=np.int64)
+        self.evs_ms = np.asarray(evs_ms, dtype=np.int64)
+        # Files are mostly in order already, which a stable sort exploits
+        order = np.argsort(self.keys(), kind="stable")
+        self.pair, self.start_ms, self.evs_ms = self.pair[order], self.start_ms[order], self.evs_ms[order]
+
+    def __len__(self):
+        return len(self.pair)
+
+    def keys(self):
+        # (pair, start) packed into one sortable int64, for the merge join;
+        # 2**40 ms is about 35 years
+        return (self.pair.astype(np.int64) << 40) | np.clip(self.start_ms, 0, (1 << 40) - 1)
+
+def read_corpus(files, pairs):
+    # Reads the files of `pairs` (a list of names; files is name to path)
+    # and parses all their times in one pass
+    pair, starts, values, columns = [], [], [], []
+    for index, name in enumerate(pairs):
+        if name not in files:
+            continue
+        file_starts, file_values, column = read_evs(files[name])
+        pair.append(np.full(len(file_starts), index, dtype=np.intp))
+        starts += file_starts
+        values.append(file_values)
+        columns.append(column)
+    pair = np.concatenate(pair) if pair else np.zeros(0, dtype=np.intp)
+    # EVS columns are parsed once per kind, e.g. EVS_ms in the pipeline's
+    # outputs and EVS in manual references
+    file_index = np.repeat(np.arange(len(values)), [len(file_values) for file_values in values])
+    evs_ms = np.zeros(len(starts), dtype=np.int64)
+    for column in set(columns):
+        files_with_column = [i for i, c in enumerate(columns) if c == column]
+        rows = np.isin(file_index, files_with_column)
+        evs_ms[rows] = evs_column_to_ms([value for i in files_with_column for value in values[i]], column)
+    return EvsCorpus(pairs, pair, times_to_ms(starts), evs_ms)
+
+def group_medians(group, values, groups):
+    # Median of `values` per group index in one sort; NaN for empty groups
+    order = np.argsort(values, kind="stable")
+    values = values[order][np.argsort(group[order], kind="stable")]
+    counts = np.bincount(group, minlength=groups)
+    offsets = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    lower = offsets + np.maximum(counts - 1, 0) // 2
+    upper = offsets + counts // 2
+    medians = np.full(groups, np.nan)
+    present = counts > 0
+    medians[present] = (values[lower[present]] + values[upper[present]]) / 2
+    return medians
+
+def pair_metrics(corpus, reference, tolerance_ms=1000):
+    # Per-pair counts, mean and median EVS, and the error of the matched
+    # sentence pairs, all as arrays over reference.pairs
+    groups = len(reference.pairs)
+    match = match_reference(corpus.keys(), reference.keys(), tolerance_ms)
+    matched = match >= 0
+    error = (corpus.evs_ms[matched] - reference.evs_ms[match[matched]]) / 1000
+    matched_pair = corpus.pair[matched]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        aligned = np.bincount(corpus.pair, minlength=groups)
+        reference_pairs = np.bincount(reference.pair, minlength=groups)
+        metrics = {
+            'aligned_pairs': aligned,
+            'reference_pairs': reference_pairs,
+            'matched_pairs': np.bincount(matched_pair, minlength=groups),
+            'mean_evs': np.bincount(corpus.pair, corpus.evs_ms / 1000, groups) / aligned,
+            'median_evs': group_medians(corpus.pair, corpus.evs_ms / 1000, groups),
+            'reference_mean_evs': np.bincount(reference.pair, reference.evs_ms / 1000, groups) / reference_pairs,
+            'reference_median_evs': group_medians(reference.pair, reference.evs_ms / 1000, groups),
+            'absolute_error': np.bincount(matched_pair, np.abs(error), groups),
+            'squared_error': np.bincount(matched_pair, error ** 2, groups),
+        }
+        metrics['mean_evs_error'] = metrics['mean_evs'] - metrics['reference_mean_evs']
+        metrics['mae'] = metrics['absolute_error'] / metrics['matched_pairs']
+        metrics['rmse'] = np.sqrt(metrics['squared_error'] / metrics['matched_pairs'])
+    return metrics
+
+def corpus_metrics(metrics, weights):
+    # The interval metrics over the pairs for every row of `weights`, the
+    # number of times each pair is drawn: ones for the estimate itself,
+    # multinomial draws for the bootstrap resamples
+    if len(metrics['mean_evs']) == 0:
+        return {metric: np.full(len(weights), np.nan) for metric in interval_metrics}
+    automatic, manual = metrics['mean_evs'], metrics['reference_mean_evs']
+    difference = automatic - manual
+    draws = weights.sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        # Centred first, so the weighted moments do not cancel
+        x, y = automatic - automatic.mean(), manual - manual.mean()
+        mean_x, mean_y = weights @ x / draws, weights @ y / draws
+        covariance = weights @ (x * y) / draws - mean_x * mean_y
+        variance = (weights @ (x * x) / draws - mean_x ** 2) * (weights @ (y * y) / draws - mean_y ** 2)
+        matched = weights @ metrics['matched_pairs']
+        return {
+            'bias': weights @ difference / draws,
+            'mean_evs_mae': weights @ np.abs(difference) / draws,
+            'mean_evs_rmse': np.sqrt(weights @ difference ** 2 / draws),
+            'correlation': covariance / np.sqrt(variance),
+            'sentence_mae': weights @ metrics['absolute_error'] / matched,
+            'sentence_rmse': np.sqrt(weights @ metrics['squared_error'] / matched),
+        }
+
+def bootstrap_intervals(metrics, n_bootstrap=2000, confidence=0.95, seed=0, chunk=500):
+    # Percentile intervals from resampling whole pairs with replacement.
+    # Resamples are drawn in chunks to bound the (resamples, pairs) matrix.
+    pairs = len(metrics['mean_evs'])
+    if pairs == 0 or n_bootstrap == 0:
+        return {metric: (np.nan, np.nan) for metric in interval_metrics}
+    rng = np.random.default_rng(seed)
+    samples = {metric: [] for metric in interval_metrics}
+    for size in np.diff(np.append(np.arange(0, n_bootstrap, chunk), n_bootstrap)):
+        weights = rng.multinomial(pairs, np.full(pairs, 1 / pairs), size=size).astype(float)
+        for metric, values in corpus_metrics(metrics, weights).items():
+            samples[metric].append(values)
+    tail = (1 - confidence) / 2 * 100
+    intervals = {}
+    for metric, values in samples.items():
+        values = np.concatenate(values)
+        # A resample without variance gives a NaN or infinite correlation
+        values = values[np.isfinite(values)]
+        intervals[metric] = tuple(np.percentile(values, [tail, 100 - tail])) if len(values) else (np.nan, np.nan)
+    return intervals
+
+def evaluate_backend(backend, files, reference, tolerance_ms=1000, n_bootstrap=2000, confidence=0.95, seed=0):
+    # One backend's outputs against the reference: a per-pair frame and a
+    # corpus row. Pairs without an output file count as missing; pairs
+    # without rows on either side have no mean EVS and are left out of the
+    # corpus metrics.
+    corpus = read_corpus(files, reference.pairs)
+    metrics = pair_metrics(corpus, reference, tolerance_ms)
+    pairs = pd.DataFrame({'backend': backend, 'pair': reference.pairs, **{column: metrics[column] for column in pair_columns[2:]}},
+                         columns=pair_columns)
+    present = np.array([name in files for name in reference.pairs], dtype=bool)
+    evaluated = present & ~np.isnan(metrics['mean_evs']) & ~np.isnan(metrics['reference_mean_evs'])
+    selected = {key: value[evaluated] for key, value in metrics.items()}
+    estimates = corpus_metrics(selected, np.ones((1, evaluated.sum())))
+    intervals = bootstrap_intervals(selected, n_bootstrap, confidence, seed)
+    row = {
+        'backend': backend,
+        'pairs': int(evaluated.sum()),
+        'missing_pairs': int((~present).sum()),
+        'aligned_pairs': int(len(corpus)),
+        'matched_pairs': int(metrics['matched_pairs'].sum()),
+        'mean_evs': corpus.evs_ms.mean() / 1000 if len(corpus) else np.nan,
+        'reference_mean_evs': reference.evs_ms.mean() / 1000 if len(reference) else np.nan,
+    }
+    for metric in interval_metrics:
+        row[metric] = estimates[metric][0]
+        row[f"{metric}_low"], row[f"{metric}_high"] = intervals[metric]
+    return pairs, row, corpus
+
+def evs_values(backend, corpus):
+    return pd.DataFrame({
+        'backend': backend,
+        'pair': np.array(corpus.pairs, dtype=object)[corpus.pair] if len(corpus) else [],
+        'source_start_ms': corpus.start_ms,
+        'EVS': corpus.evs_ms / 1000,
+    })
+
+def evaluate(reference_directory, backends, tolerance=1.0, n_bootstrap=2000, confidence=0.95, seed=0):
+    # `backends` maps a backend name to the directory of its alignment
+    # outputs. Returns the per-pair frame, the corpus frame, and the EVS
+    # values of every backend and of the reference, for plots.
+    reference_files = list_pairs(reference_directory)
+    reference = read_corpus(reference_files, list(reference_files))
+    tolerance_ms = round(tolerance * 1000)
+    pair_frames, rows, values = [], [], [evs_values("manual", reference)]
+    for backend, directory in backends.items():
+        pairs, row, corpus = evaluate_backend(backend, list_pairs(directory), reference, tolerance_ms, n_bootstrap, confidence, seed)
+        pair_frames.append(pairs)
+        rows.append(row)
+        values.append(evs_values(backend, corpus))
+    return pd.concat(pair_frames, ignore_index=True), pd.DataFrame(rows, columns=corpus_columns), pd.concat(values, ignore_index=True)
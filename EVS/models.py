@@ -0,0 +1,117 @@
+import hashlib
+import json
+import os
+from datetime import datetime
+
+from .registry import resolve
+
+# Pinned local copies of the models. The store is a JSON file that maps
+# "<kind>:<name>" (or "sbd:<name>:<language>" for per-language segmenters) to
+# a directory; a backend with a pinned directory loads from it and never
+# touches the network. Backends without an entry behave as before.
+
+default_store = os.path.join(os.path.expanduser("~"), ".cache", "evs", "models.json")
+
+def store_path():
+    return os.environ.get("EVS_MODEL_STORE") or default_store
+
+def read_store(path=None):
+    path = path or store_path()
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as jsonfile:
+        return json.load(jsonfile)
+
+def write_store(entries, path=None):
+    path = path or store_path()
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(f"{path}.tmp", "w", encoding="utf-8") as jsonfile:
+        json.dump(entries, jsonfile, indent=2, sort_keys=True)
+    os.replace(f"{path}.tmp", path)
+
+def model_key(kind, name, language=None):
+    return ":".join([kind, name] + ([language] if language else []))
+
+def pinned_path(kind, name, language=None):
+    entries = read_store()
+    for key in (model_key(kind, name, language), model_key(kind, name)):
+        if key in entries:
+            return entries[key]["path"]
+    return None
+
+def installed_versions(packages):
+    # Versions of the distributions a backend's output depends on, None for missing ones
+    from importlib import metadata
+
+    versions = {}
+    for package in packages:
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            versions[package] = None
+    return versions
+
+def path_digest(path):
+    # Identifies a local model copy by its path and the name, size and mtime
+    # of every file in it, so that replacing the files gives a new digest
+    # without reading gigabytes of weights
+    path = os.path.abspath(path)
+    digest = hashlib.sha256(path.encode("utf-8"))
+    files = [path] if os.path.isfile(path) else []
+    for directory, directories, names in os.walk(path):
+        directories.sort()
+        files += [os.path.join(directory, name) for name in sorted(names)]
+    for file_path in files:
+        status = os.stat(file_path)
+        digest.update(f"{os.path.relpath(file_path, path)}\x1f{status.st_size}\x1f{status.st_mtime_ns}\n".encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+def hugging_face_commit(model_name):
+    # The commit that the Hugging Face cache resolves `main` to for this
+    # model, or None when it has not been downloaded through the cache
+    cache = (os.environ.get("HF_HUB_CACHE") or os.environ.get("TRANSFORMERS_CACHE")
+             or os.path.join(os.environ.get("HF_HOME") or os.path.join(os.path.expanduser("~"), ".cache", "huggingface"), "hub"))
+    ref = os.path.join(cache, "models--" + model_name.replace("/", "--"), "refs", "main")
+    try:
+        with open(ref, encoding="utf-8") as reffile:
+            return reffile.read().strip() or None
+    except OSError:
+        return None
+
+def tf_hub_digest(model_url):
+    # Digest of the module that TF Hub downloaded for this URL, or None
+    # before it has been downloaded
+    import tempfile
+
+    cache = os.environ.get("TFHUB_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "tfhub_modules")
+    module = os.path.join(cache, hashlib.sha1(model_url.encode("utf-8")).hexdigest())
+    return path_digest(module) if os.path.isdir(module) else None
+
+def pin(kind, name, path, language=None):
+    resolve(kind, name)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No model files at {path}")
+    entries = read_store()
+    entries[model_key(kind, name, language)] = {
+        "path": os.path.abspath(path),
+        "pinned": datetime.now().isoformat(timespec="seconds"),
+    }
+    write_store(entries)
+    return entries[model_key(kind, name, language)]
+
+def unpin(kind, name, language=None):
+    entries = read_store()
+    removed = entries.pop(model_key(kind, name, language), None)
+    write_store(entries)
+    return removed
+
+def fetch(kind, name, directory, language=None):
+    # Downloads the model once through the backend itself, saves it under
+    # `directory` and pins that copy
+    backend = resolve(kind, name)
+    target = os.path.join(directory, model_key(kind, name, language).replace(":", "-"))
+    if kind == "sbd":
+        backend(language).fetch(target)
+    else:
+        backend().fetch(target)
+    return pin(kind, name, target, language)
@@ -0,0 +1,215 @@
+import csv
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from . import profiling
+from .SBD import get_segmenter, pause_options, segment_file, write_sentences
+from .alignment import (EmbeddingCache, align_pair, alignment_inputs, embedding_model, encoding_inputs, get_encoder,
+                        read_alignment, write_alignment)
+from .stage_cache import StageCache, add_status, empty_status, memoized, status_report, status_text
+
+summary_columns = ["name", "status", "source_sentences", "target_sentences", "aligned_pairs",
+                   "mean_evs", "median_evs", "seconds", "reused_stages", "alignment_file"]
+
+thread_variables = ["OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS", "TF_NUM_INTRAOP_THREADS"]
+
+def read_manifest(manifest_file):
+    # CSV with `source` and `target` .word.srt columns and an optional `name`;
+    # relative paths are resolved against the manifest's directory
+    base_directory = os.path.dirname(os.path.abspath(manifest_file))
+    pairs = []
+    with open(manifest_file, encoding="utf-8", newline="") as csvfile:
+        for row in csv.DictReader(csvfile):
+            source = os.path.join(base_directory, row["source"].strip())
+            target = os.path.join(base_directory, row["target"].strip())
+            name = (row.get("name") or "").strip() or os.path.basename(source).replace(".word.srt", "")
+            pairs.append({"name": name, "source": source, "target": target})
+    return pairs
+
+class Pipeline:
+    # Holds one segmenter per language and one encoder; each model is loaded
+    # on the first pair that needs it and stays resident for the rest.
+
+    def __init__(self, sbd_model, source_language, target_language, alignment_model, similarity_threshold,
+                 embedding_cache=None, cache_size_mb=1024, band=None, time_window=None, batch_size=32,
+                 sbd_processes=1, intermediate="csv", aligner="dtw", stage_cache=None, force=(),
+                 pause_ms=None, punctuation_pause_ms=None, stage_cache_size_mb=4096):
+        # Keyword arguments are kept so that worker processes can rebuild the pipeline
+        self.options = dict(
+            sbd_model=sbd_model, source_language=source_language, target_language=target_language,
+            alignment_model=alignment_model, similarity_threshold=similarity_threshold,
+            embedding_cache=embedding_cache, cache_size_mb=cache_size_mb, band=band, time_window=time_window,
+            batch_size=batch_size, sbd_processes=sbd_processes, intermediate=intermediate, aligner=aligner,
+            stage_cache=stage_cache, force=force, pause_ms=pause_ms, punctuation_pause_ms=punctuation_pause_ms,
+            stage_cache_size_mb=stage_cache_size_mb,
+        )
+        self.source_language = source_language
+        self.target_language = target_language
+        self.similarity_threshold = similarity_threshold
+        self.band = band
+        self.time_window = time_window
+        self.intermediate = intermediate
+        self.aligner = aligner
+        # Directory of the stage cache; without one every stage runs for every pair
+        self.stage_cache = StageCache(stage_cache, force, stage_cache_size_mb * 1024 * 1024) if stage_cache else None
+        # pause_ms and punctuation_pause_ms hold --pause_ms style values: a number or LANGUAGE=NUMBER each
+        self.source_segmenter = get_segmenter(sbd_model, source_language, n_process=sbd_processes,
+                                              **pause_options(source_language, pause_ms, punctuation_pause_ms))
+        if target_language == source_language:
+            self.target_segmenter = self.source_segmenter
+        else:
+            self.target_segmenter = get_segmenter(sbd_model, target_language, n_process=sbd_processes,
+                                                  **pause_options(target_language, pause_ms, punctuation_pause_ms))
+        cache = EmbeddingCache(embedding_cache, cache_size_mb * 1024 * 1024) if embedding_cache else None
+        self.encoder = get_encoder(alignment_model, cache, batch_size)
+
+    def load(self):
+        self.source_segmenter.ready()
+        self.target_segmenter.ready()
+        self.encoder.ready()
+        return self
+
+    def segment(self, srt_file, segmenter, language, output_file):
+        # Columnar tables are written with their embeddings, so the alignment
+        # stage can later be re-run from them without the encoder. Returns
+        # the encoding key as well, for the alignment key.
+        table = segment_file(srt_file, segmenter, self.stage_cache)
+        embeddings, encoding_key = memoized(self.stage_cache, "encoding", lambda: encoding_inputs(table, self.encoder, language),
+                                            lambda: self.encoder.encode(table.sentences, language), np.load, np.save)
+        if self.intermediate != "csv":
+            table.embeddings = embeddings
+            table.embedding_model = embedding_model(self.encoder, language)
+        write_sentences(output_file, table)
+        return table, embeddings, encoding_key
+
+    def process_pair(self, pair, output_directory):
+        started = time.perf_counter()
+        prefix = os.path.join(output_directory, pair["name"])
+
+        source, source_embeddings, source_key = self.segment(pair["source"], self.source_segmenter, self.source_language,
+                                                             f"{prefix}_source.{self.intermediate}")
+        target, target_embeddings, target_key = self.segment(pair["target"], self.target_segmenter, self.target_language,
+                                                             f"{prefix}_target.{self.intermediate}")
+
+        aligned_df, _ = memoized(self.stage_cache, "alignment",
+                                 lambda: alignment_inputs(source_key, target_key, self.similarity_threshold,
+                                                          self.band, self.time_window, self.aligner),
+                                 lambda: align_pair(source.to_frame(), target.to_frame(), source_embeddings, target_embeddings,
+                                                    self.similarity_threshold, self.band, self.time_window, self.aligner),
+                                 read_alignment, write_alignment)
+        alignment_file = f"{prefix}_Alignment_EVS.csv"
+        write_alignment(alignment_file, aligned_df)
+        profiling.count("pairs")
+        profiling.count("aligned_pairs", len(aligned_df))
+
+        evs = evs_seconds(aligned_df)
+        stages = self.stage_cache.take_status() if self.stage_cache else empty_status()
+        return {
+            "name": pair["name"],
+            "status": "ok",
+            "source_sentences": len(source),
+            "target_sentences": len(target),
+            "aligned_pairs": len(aligned_df),
+            "mean_evs": round(float(evs.mean()), 3) if len(evs) else "",
+            "median_evs": round(float(np.median(evs)), 3) if len(evs) else "",
+            "seconds": round(time.perf_counter() - started, 3),
+            "reused_stages": status_text(stages),
+            "alignment_file": alignment_file,
+            "stages": stages,
+        }
+
+def evs_seconds(aligned_df):
+    if aligned_df.empty:
+        return np.array([])
+    return aligned_df['EVS_ms'].to_numpy(np.int64) / 1000
+
+def write_summary(summary_file, rows):
+    with open(summary_file, "w", encoding="utf-8", newline="") as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=summary_columns, extrasaction="ignore")
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+
+def process_pair_safely(pipeline, pair, output_directory):
+    # A failing pair is reported in the summary instead of stopping the corpus
+    started = time.perf_counter()
+    try:
+        return pipeline.process_pair(pair, output_directory)
+    except Exception as e:
+        traceback.print_exc()
+        if pipeline.stage_cache is not None:
+            # Stages of the failed pair are not counted in the next pair's status
+            pipeline.stage_cache.take_status()
+        return {
+            "name": pair["name"],
+            "status": f"failed: {type(e).__name__}: {e}",
+            "seconds": round(time.perf_counter() - started, 3),
+        }
+
+def limit_threads(threads):
+    # Environment variables cover frameworks imported later in the worker
+    for variable in thread_variables:
+        os.environ[variable] = str(threads)
+    os.environ["TF_NUM_INTEROP_THREADS"] = "1"
+    if "torch" in sys.modules:
+        sys.modules["torch"].set_num_threads(threads)
+
+worker_pipeline = None
+
+def init_worker(pipeline_options, threads, profile=False):
+    # With profiling on, each worker records its own stages (model loading
+    # included) and sends them back with its first pair
+    global worker_pipeline
+    if profile:
+        profiling.start()
+    limit_threads(threads)
+    worker_pipeline = Pipeline(**pipeline_options)
+    if not pipeline_options.get("stage_cache"):
+        # With a stage cache the models load on the first pair that needs
+        # them, so a run whose stages are all stored loads none
+        worker_pipeline.load()
+    limit_threads(threads)
+
+def run_worker_pair(pair, output_directory):
+    row = process_pair_safely(worker_pipeline, pair, output_directory)
+    return row, profiling.active.take() if profiling.active is not None else None
+
+def report(row):
+    if row["status"] == "ok":
+        reused = f" (reused {row['reused_stages']})" if row["reused_stages"] else ""
+        print(f"{row['name']}: {row['aligned_pairs']} aligned pairs in {row['seconds']}s{reused}")
+    else:
+        print(f"{row['name']}: {row['status']}")
+
+def run_batch(pairs, output_directory, pipeline, workers=1):
+    os.makedirs(output_directory, exist_ok=True)
+    rows = []
+    if workers > 1:
+        # Every worker loads the models once in its initializer and keeps them
+        # resident; CPU threads are split so the workers do not oversubscribe
+        threads = max(1, (os.cpu_count() or 1) // workers)
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                                 initargs=(pipeline.options, threads, profiling.active is not None)) as executor:
+            for row, stages in executor.map(run_worker_pair, pairs, [output_directory] * len(pairs)):
+                if stages is not None:
+                    profiling.active.merge(stages)
+                report(row)
+                rows.append(row)
+    else:
+        for pair in pairs:
+            row = process_pair_safely(pipeline, pair, output_directory)
+            report(row)
+            rows.append(row)
+    write_summary(os.path.join(output_directory, "corpus_summary.csv"), rows)
+    if pipeline.stage_cache is not None:
+        status = empty_status()
+        for row in rows:
+            if "stages" in row:
+                add_status(status, row["stages"])
+        print(f"Stage cache {pipeline.stage_cache.directory}: {status_report(status)}")
+    return rows
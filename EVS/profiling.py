@@ -0,0 +1,158 @@
+import cProfile
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Stages are marked in the pipeline code with `with stage("encoding") as counts:`.
+# They cost nothing unless a profiler has been started, e.g. by `--profile`.
+
+active = None
+
+default_report = "evs_profile.json"
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+class Profiler:
+    # Wall time, CPU time, peak RSS and item counts per stage. Times are
+    # exclusive: a stage that runs inside another one, such as a model loaded
+    # lazily on the first batch to encode, is not counted again in the outer
+    # stage, so the stages add up to the run. With `dump_stage`, that stage
+    # also runs under cProfile.
+
+    def __init__(self, dump_stage=None):
+        self.stages = {}
+        self.counts = {}
+        self.nested = []
+        self.dump_stage = dump_stage
+        self.dump = cProfile.Profile() if dump_stage else None
+        self.started = datetime.now().isoformat(timespec="seconds")
+        self.wall = time.perf_counter()
+        self.cpu = time.process_time()
+
+    @contextmanager
+    def stage(self, name):
+        counts = {}
+        self.nested.append([0.0, 0.0])
+        dumping = self.dump is not None and name == self.dump_stage
+        if dumping:
+            self.dump.enable()
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield counts
+        finally:
+            wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+            if dumping:
+                self.dump.disable()
+            nested_wall, nested_cpu = self.nested.pop()
+            if self.nested:
+                self.nested[-1][0] += wall
+                self.nested[-1][1] += cpu
+            self.add(name, {"calls": 1, "wall_seconds": wall - nested_wall, "cpu_seconds": cpu - nested_cpu,
+                            "peak_rss_mb": peak_rss_mb(), **counts})
+
+    def add(self, name, record):
+        entry = self.stages.setdefault(name, {})
+        for key, value in record.items():
+            if key == "peak_rss_mb":
+                entry[key] = max(value, entry.get(key) or 0) if value is not None else entry.get(key)
+            else:
+                entry[key] = entry.get(key, 0) + value
+
+    def count(self, name, value=1):
+        self.counts[name] = self.counts.get(name, 0) + value
+
+    def take(self):
+        # Stages recorded since the last call, for a worker process to send back
+        stages, counts = self.stages, self.counts
+        self.stages, self.counts = {}, {}
+        return stages, counts
+
+    def merge(self, snapshot):
+        stages, counts = snapshot
+        for name, record in stages.items():
+            self.add(name, record)
+        for name, value in counts.items():
+            self.count(name, value)
+
+    def report(self, command=None):
+        stages = {}
+        for name, record in self.stages.items():
+            stages[name] = {key: round(value, 4) if isinstance(value, float) else value for key, value in record.items()}
+        return {
+            "command": command,
+            "started": self.started,
+            "wall_seconds": round(time.perf_counter() - self.wall, 4),
+            "cpu_seconds": round(time.process_time() - self.cpu, 4),
+            "peak_rss_mb": peak_rss_mb(),
+            "counts": self.counts,
+            "stages": stages,
+        }
+
+    def write(self, report_file, command=None):
+        with open(report_file, "w", encoding="utf-8") as jsonfile:
+            json.dump(self.report(command), jsonfile, indent=2)
+        if self.dump is not None:
+            self.dump.dump_stats(f"{os.path.splitext(report_file)[0]}.{self.dump_stage}.prof")
+        return report_file
+
+def stage(name):
+    if active is None:
+        return nullcontext({})
+    return active.stage(name)
+
+def count(name, value=1):
+    if active is not None:
+        active.count(name, value)
+
+def start(dump_stage=None):
+    global active
+    active = Profiler(dump_stage)
+    return active
+
+@contextmanager
+def profiled(report_file, dump_stage=None, command=None):
+    # Profiles the block and writes the JSON report (and the cProfile dump of
+    # `dump_stage`, if any) even when the block fails; no-op unless either
+    # a report file or a stage to dump is given
+    global active
+    if report_file is None and dump_stage is not None:
+        report_file = default_report
+    if report_file is None:
+        yield None
+        return
+    profiler = start(dump_stage)
+    try:
+        yield profiler
+    finally:
+        active = None
+        profiler.write(report_file, command)
+        print(f"Profile written to {report_file}")
+
+def pop_profile_options(argv):
+    # For the scripts with positional arguments: takes out
+    # `--profile[=report.json]` and `--profile_stage=STAGE`
+    report_file = dump_stage = None
+    remaining = []
+    for argument in argv:
+        if argument == "--profile":
+            report_file = default_report
+        elif argument.startswith("--profile="):
+            report_file = argument.split("=", 1)[1]
+        elif argument.startswith("--profile_stage="):
+            dump_stage = argument.split("=", 1)[1]
+        else:
+            remaining.append(argument)
+    return remaining, report_file, dump_stage
@@ -0,0 +1,41 @@
+import importlib
+
+# Backends are named by entry point so that resolving one imports only its
+# module; the heavy frameworks are imported later, when the model is loaded.
+sbd_backends = {
+    'punkt': 'EVS.SBD.segmenters:PunktSegmenter',
+    'spacy': 'EVS.SBD.segmenters:SpacySegmenter',
+    'stanza': 'EVS.SBD.segmenters:StanzaSegmenter',
+    'rule': 'EVS.SBD.segmenters:RuleSegmenter',
+    'pause': 'EVS.SBD.segmenters:PauseSegmenter',
+}
+
+alignment_backends = {
+    'LASER': 'EVS.alignment.encoders:LaserEncoder',
+    'mT5': 'EVS.alignment.encoders:MT5Encoder',
+    'SBERT': 'EVS.alignment.encoders:SBERTEncoder',
+    'USE': 'EVS.alignment.encoders:USEEncoder',
+    'XLM_Roberta': 'EVS.alignment.encoders:XLMRobertaEncoder',
+    # int8 ONNX Runtime exports of the PyTorch encoders, for CPU-only machines
+    'mT5_onnx': 'EVS.alignment.onnx_encoders:MT5OnnxEncoder',
+    'SBERT_onnx': 'EVS.alignment.onnx_encoders:SBERTOnnxEncoder',
+    'XLM_Roberta_onnx': 'EVS.alignment.onnx_encoders:XLMRobertaOnnxEncoder',
+}
+
+registries = {
+    'sbd': sbd_backends,
+    'alignment': alignment_backends,
+}
+
+def resolve(kind, name):
+    # A name containing ':' is taken as an entry point itself, which lets
+    # benchmarks and experiments plug in backends without registering them
+    backends = registries[kind]
+    if ':' in name:
+        entry_point = name
+    elif name in backends:
+        entry_point = backends[name]
+    else:
+        raise KeyError(f"Unsupported {kind} model: {name}. Choose from {', '.join(backends)}")
+    module_name, attribute = entry_point.split(':')
+    return getattr(importlib.import_module(module_name), attribute)
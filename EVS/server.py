@@ -0,0 +1,252 @@
+import base64
+import json
+import os
+import signal
+import socket
+import socketserver
+import sys
+import threading
+
+import numpy as np
+
+from .SBD.segmenters import Segmenter, create_segmenter
+from .SBD.srt import Words
+from .SBD.word_index import build_word_index
+from .alignment.encoders import Encoder, create_encoder
+
+# A long-lived process that keeps segmenters and encoders loaded, so that
+# short CLI runs skip model loading. Requests and responses are single lines
+# of JSON, over a Unix socket or over stdin/stdout. Embeddings travel as
+# base64-encoded float32 buffers.
+
+default_socket = os.path.join(os.path.expanduser("~"), ".cache", "evs", "server.sock")
+
+def encode_array(array):
+    array = np.ascontiguousarray(array, dtype=np.float32)
+    return {"shape": list(array.shape), "data": base64.b64encode(array.tobytes()).decode("ascii")}
+
+def decode_array(payload):
+    return np.frombuffer(base64.b64decode(payload["data"]), dtype=np.float32).reshape(payload["shape"])
+
+class ModelHost:
+    # The warm models, created on the first request that names them. Model
+    # calls are serialized, since the frameworks are not all thread-safe.
+
+    def __init__(self, batch_size=32):
+        self.batch_size = batch_size
+        self.segmenters = {}
+        self.encoders = {}
+        self.lock = threading.Lock()
+
+    def segmenter_key(self, request):
+        return (request["name"], request["language"], json.dumps(request.get("options") or {}, sort_keys=True))
+
+    def segmenter(self, request):
+        key = self.segmenter_key(request)
+        if key not in self.segmenters:
+            self.segmenters[key] = create_segmenter(request["name"], request["language"], **(request.get("options") or {})).ready()
+        return self.segmenters[key]
+
+    def segmenter_identity(self, request):
+        # The fingerprint of the segmenter this server runs, loaded or not
+        key = self.segmenter_key(request)
+        segmenter = self.segmenters.get(key) or create_segmenter(request["name"], request["language"], **(request.get("options") or {}))
+        return {"fingerprint": segmenter.fingerprint()}
+
+    def identity(self, request):
+        # The id and revision of an encoder, from the loaded one if there is
+        # one; otherwise the encoder is created without loading its weights,
+        # unless they still have to be downloaded to know their revision
+        encoder = self.encoders.get(request["name"]) or create_encoder(request["name"], batch_size=self.batch_size)
+        identity = {"model_id": encoder.model_id, "revision": encoder.revision, "fingerprint": encoder.fingerprint()}
+        if encoder.model is not None:
+            self.encoders[request["name"]] = encoder
+        return identity
+
+    def encoder(self, request):
+        if request["name"] not in self.encoders:
+            self.encoders[request["name"]] = create_encoder(request["name"], batch_size=self.batch_size).ready()
+        return self.encoders[request["name"]]
+
+    def handle(self, request):
+        op = request.get("op")
+        if op == "ping":
+            return {"segmenters": [list(key[:2]) for key in self.segmenters], "encoders": list(self.encoders)}
+        if op == "load":
+            if request["kind"] == "sbd":
+                self.segmenter(request)
+                return {}
+            self.encoder(request)
+            return self.identity(request)
+        if op == "identify":
+            if request.get("kind") == "sbd":
+                return self.segmenter_identity(request)
+            return self.identity(request)
+        if op == "segment":
+            return {"spans": [[int(start), int(end)] for start, end in self.segmenter(request).segment(request["text"])]}
+        if op == "segment_words":
+            words = Words(request["starts"], request["ends"], request["texts"])
+            combined_text, offsets = build_word_index(words.texts)
+            spans = self.segmenter(request).segment_words(words, combined_text, offsets)
+            return {"spans": [[int(start), int(end)] for start, end in spans]}
+        if op == "embed":
+            return encode_array(self.encoder(request).embed_batched(request["sentences"], request.get("language")))
+        raise ValueError(f"Unknown request: {op}")
+
+    def respond(self, line):
+        try:
+            with self.lock:
+                response = self.handle(json.loads(line))
+        except SystemExit:
+            # Backends exit on unusable models; the server reports it and stays up
+            response = {"error": "the backend could not load its model; see the server's log"}
+        except Exception as e:
+            response = {"error": f"{type(e).__name__}: {e}"}
+        return json.dumps(response) + "\n"
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            self.wfile.write(self.server.host.respond(line).encode("utf-8"))
+            self.wfile.flush()
+
+class ModelServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+def serve_socket(host, path=default_socket):
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    if os.path.exists(path):
+        os.unlink(path)
+    # The socket is created with mode 0600 by bind itself, so other users
+    # never get a window to connect before it is restricted
+    umask = os.umask(0o177)
+    try:
+        server = ModelServer(path, RequestHandler)
+    finally:
+        os.umask(umask)
+    with server:
+        server.host = host
+        # SIGTERM unwinds like Ctrl-C, so the socket file is removed
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+        print(f"Serving models on {path}", file=sys.stderr)
+        try:
+            server.serve_forever()
+        finally:
+            os.unlink(path)
+
+def serve_stdio(host):
+    # Backends may print while loading, so everything but the responses is
+    # sent to stderr
+    responses = sys.stdout
+    sys.stdout = sys.stderr
+    for line in sys.stdin:
+        if line.strip():
+            responses.write(host.respond(line))
+            responses.flush()
+
+class Connection:
+    def __init__(self, address):
+        self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            self.socket.connect(address)
+        except OSError as e:
+            raise ConnectionError(f"No model server at {address} ({e}); start one with `python main.py serve`") from e
+        self.file = self.socket.makefile("rwb")
+
+    def request(self, **request):
+        self.file.write(json.dumps(request).encode("utf-8") + b"\n")
+        self.file.flush()
+        response = json.loads(self.file.readline())
+        if "error" in response:
+            raise RuntimeError(f"Model server: {response['error']}")
+        return response
+
+connections = {}
+
+def connect(address):
+    # One connection per process; forked workers open their own
+    key = (address, os.getpid())
+    if key not in connections:
+        connections[key] = Connection(address)
+    return connections[key]
+
+class RemoteSegmenter(Segmenter):
+    # Stands in for a segmenter that stays loaded in the model server
+
+    def __init__(self, backend, language, address, **options):
+        super().__init__(language, None, **options)
+        self.name = backend
+        self.address = address
+        self.remote = {}
+
+    def fingerprint(self):
+        # The served segmenter's own, asked for once without loading it, so a
+        # server with another model copy or version never reuses these artifacts
+        if not self.remote:
+            self.remote = self.request_from(connect(self.address), op="identify")
+        return self.remote["fingerprint"]
+
+    def request_from(self, connection, **request):
+        return connection.request(kind="sbd", name=self.name, language=self.language, options=self.options, **request)
+
+    def request(self, **request):
+        return self.request_from(self.nlp, **request)
+
+    def load(self):
+        connection = connect(self.address)
+        self.request_from(connection, op="load")
+        return connection
+
+    def split(self, text):
+        return [tuple(span) for span in self.request(op="segment", text=text)["spans"]]
+
+    def segment_words(self, words, combined_text, offsets):
+        self.ready()
+        spans = self.request(op="segment_words", texts=words.texts, starts=words.starts.tolist(), ends=words.ends.tolist())["spans"]
+        return [tuple(span) for span in spans]
+
+class RemoteEncoder(Encoder):
+    # Stands in for an encoder that stays loaded in the model server; it
+    # reports the server model's id and revision, so the embedding cache and
+    # the stored table embeddings stay valid. The identity is asked for
+    # without loading the model and kept, so a run whose embeddings are all
+    # cached never makes the server load it.
+
+    def __init__(self, backend, address, cache=None, batch_size=32):
+        super().__init__(cache, batch_size)
+        self.name = backend
+        self.address = address
+        self.remote = {}
+
+    def identify(self):
+        if not self.remote:
+            self.remote = connect(self.address).request(op="identify", kind="alignment", name=self.name)
+        return self.remote
+
+    @property
+    def model_id(self):
+        return self.identify()["model_id"]
+
+    @property
+    def revision(self):
+        return self.identify()["revision"]
+
+    def fingerprint(self):
+        # The served encoder's own, so the stage cache keys match between local and served runs
+        return self.identify()["fingerprint"]
+
+    def load(self):
+        connection = connect(self.address)
+        self.remote = connection.request(op="load", kind="alignment", name=self.name)
+        return connection
+
+    def embed(self, sentences, language):
+        return self.embed_batched(sentences, language)
+
+    def embed_batched(self, sentences, language):
+        # The server batches by length itself
+        self.ready()
+        if not sentences:
+            return np.zeros((0, 0), dtype=np.float32)
+        return decode_array(self.model.request(op="embed", name=self.name, language=language, sentences=list(sentences)))
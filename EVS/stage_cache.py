@@ -0,0 +1,205 @@
+import hashlib
+import json
+import os
+import shutil
+from datetime import datetime
+
+import numpy as np
+
+from . import profiling
+
+# Memoized pipeline stages. Every artifact (a segmented sentence table, the
+# embeddings of a table, an alignment) is stored under a fingerprint of what
+# it was computed from: file contents, backend, model version and
+# parameters. A stage whose fingerprint is already stored reads the artifact
+# instead of running. The fingerprints chain, since the encoding key covers
+# the sentences and times and the alignment key covers both encoding keys,
+# so changing the aligner or the threshold only re-runs the alignment. The
+# store is content-addressed and kept outside the output directories, so a
+# new output directory or a renamed pair reuses it as well. Like the
+# embedding cache it is bounded by size: reading an artifact marks it as
+# used, and the least recently used artifacts are removed once the store
+# grows past `max_bytes`.
+
+default_directory = os.path.join(os.path.expanduser("~"), ".cache", "evs", "stages")
+
+default_max_bytes = 4 * 1024 * 1024 * 1024
+
+stage_names = ("segmentation", "encoding", "alignment")
+
+artifact_extensions = {"segmentation": ".npz", "encoding": ".npy", "alignment": ".csv"}
+
+# Raised when a stage's code changes what it produces; the stored artifacts
+# of that stage, and of the stages after it, are then no longer used
+stage_versions = {"segmentation": 1, "encoding": 1, "alignment": 1}
+
+def cache_directory():
+    return os.environ.get("EVS_STAGE_CACHE") or default_directory
+
+file_digests = {}
+
+def file_digest(path):
+    # sha256 of the contents, remembered per path, size and mtime in this process
+    status = os.stat(path)
+    identity = (os.path.abspath(path), status.st_size, status.st_mtime_ns)
+    if identity not in file_digests:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        file_digests[identity] = digest.hexdigest()
+    return file_digests[identity]
+
+def table_digest(table):
+    # sha256 of a sentence table's texts and times; a re-segmentation that
+    # gives the same sentences keeps the encoding key
+    digest = hashlib.sha256()
+    digest.update("\x1e".join(table.sentences).encode("utf-8"))
+    digest.update(np.ascontiguousarray(table.start_ms, dtype=np.int64).tobytes())
+    digest.update(np.ascontiguousarray(table.end_ms, dtype=np.int64).tobytes())
+    return digest.hexdigest()
+
+def stage_key(stage_name, inputs):
+    text = json.dumps({"stage": stage_name, "version": stage_versions[stage_name], "inputs": inputs},
+                      sort_keys=True, default=str)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def empty_status():
+    return {name: {"reused": 0, "computed": 0} for name in stage_names}
+
+def status_text(status):
+    # "segmentation encoding 1/2": the stages whose artifacts were reused,
+    # with a count when only some of them were
+    parts = []
+    for name in stage_names:
+        reused, computed = status[name]["reused"], status[name]["computed"]
+        if reused:
+            parts.append(name if not computed else f"{name} {reused}/{reused + computed}")
+    return " ".join(parts)
+
+def add_status(total, status):
+    for name in stage_names:
+        for outcome in ("reused", "computed"):
+            total[name][outcome] += status[name][outcome]
+    return total
+
+def status_report(status):
+    return ", ".join(f"{name} {status[name]['reused']}/{status[name]['reused'] + status[name]['computed']}"
+                     for name in stage_names) + " reused"
+
+class StageCache:
+    # `force` lists the stages that run even when their artifact is stored;
+    # their new artifacts replace the stored ones
+
+    def __init__(self, directory=None, force=(), max_bytes=default_max_bytes):
+        self.directory = directory or cache_directory()
+        self.force = set(force)
+        self.max_bytes = max_bytes
+        self.status = empty_status()
+
+    def path(self, stage_name, key):
+        return os.path.join(self.directory, stage_name, key[:2], key + artifact_extensions[stage_name])
+
+    def lookup(self, stage_name, key):
+        # Path of the stored artifact, or None when the stage has to run
+        path = self.path(stage_name, key)
+        if stage_name in self.force:
+            return None
+        try:
+            # The modification time records the last use, for eviction
+            os.utime(path)
+        except OSError:
+            return None
+        return path
+
+    def store(self, stage_name, key, write, inputs):
+        # `write(path)` writes the artifact; it is written under a temporary
+        # name with the same extension and moved into place, so workers
+        # storing the same key never leave a partial file. The inputs are
+        # kept next to it to show what the artifact was computed from.
+        path = self.path(stage_name, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        stem, extension = os.path.splitext(path)
+        temporary_file = f"{stem}.{os.getpid()}.tmp{extension}"
+        write(temporary_file)
+        os.replace(temporary_file, path)
+        with open(f"{temporary_file}.json", "w", encoding="utf-8") as jsonfile:
+            json.dump({"stage": stage_name, "version": stage_versions[stage_name], "inputs": inputs,
+                       "created": datetime.now().isoformat(timespec="seconds")}, jsonfile, indent=2, default=str)
+        os.replace(f"{temporary_file}.json", f"{stem}.json")
+        self.evict()
+
+    def artifacts(self, stages=stage_names):
+        # (path, size, last use) of every stored artifact of `stages`
+        artifacts = []
+        for name in stages:
+            for directory, _, files in os.walk(os.path.join(self.directory, name)):
+                for file_name in files:
+                    if file_name.endswith(artifact_extensions[name]) and ".tmp" not in file_name:
+                        path = os.path.join(directory, file_name)
+                        try:
+                            status = os.stat(path)
+                        except FileNotFoundError:
+                            continue
+                        artifacts.append((path, status.st_size, status.st_mtime))
+        return artifacts
+
+    def evict(self):
+        # Removes the least recently used artifacts, with their inputs,
+        # until the store fits in max_bytes. Other workers may be removing
+        # the same ones.
+        artifacts = self.artifacts()
+        excess = sum(size for _, size, _ in artifacts) - self.max_bytes
+        for path, size, _ in sorted(artifacts, key=lambda artifact: artifact[2]):
+            if excess <= 0:
+                break
+            for stale in (path, os.path.splitext(path)[0] + ".json"):
+                try:
+                    os.unlink(stale)
+                except FileNotFoundError:
+                    pass
+            excess -= size
+
+    def record(self, stage_name, reused):
+        outcome = "reused" if reused else "computed"
+        self.status[stage_name][outcome] += 1
+        profiling.count(f"{stage_name}_{outcome}")
+
+    def take_status(self):
+        status, self.status = self.status, empty_status()
+        return status
+
+    def usage(self):
+        # Stored artifacts and their size in bytes per stage
+        usage = {}
+        for name in stage_names:
+            artifacts = self.artifacts([name])
+            usage[name] = (len(artifacts), sum(size for _, size, _ in artifacts))
+        return usage
+
+    def clear(self, stages=stage_names):
+        for name in stages:
+            shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+
+def memoized(cache, stage_name, inputs, compute, read, write):
+    # Runs compute() unless `cache` holds the stage's artifact for these
+    # inputs. `inputs` is a function returning the inputs, so nothing is
+    # hashed without a cache. Returns the result and its key, which the
+    # stages after this one include in their own inputs.
+    if cache is None:
+        return compute(), None
+    stage_inputs = inputs()
+    key = stage_key(stage_name, stage_inputs)
+    stored = cache.lookup(stage_name, key)
+    if stored is not None:
+        try:
+            result = read(stored)
+        except OSError:
+            # Evicted by another worker between the lookup and the read
+            stored = None
+    cache.record(stage_name, stored is not None)
+    if stored is not None:
+        return result, key
+    result = compute()
+    cache.store(stage_name, key, lambda path: write(path, result), stage_inputs)
+    return result, key
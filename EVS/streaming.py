@@ -0,0 +1,234 @@
+import csv
+import os
+import queue
+import re
+import stat
+import sys
+import threading
+import time
+
+import numpy as np
+
+from .SBD import clean_sentence, sentence_row
+from .SBD.srt import SrtParser, Words
+from .SBD.word_index import build_word_index, map_spans_to_entries
+from .alignment import alignment_columns, ms_to_time
+from .alignment.dtw import time_window_bounds, windowed_path
+
+def follow_srt(path, entries, poll_interval=0.2, idle_timeout=None):
+    # Puts every complete (start_ms, end_ms, text) entry on `entries` as it is
+    # written, then None. A regular file is tailed until it stops growing for
+    # `idle_timeout` seconds; a pipe (or "-" for stdin) is read until closed.
+    stream = sys.stdin if path == "-" else open(path, encoding="utf-8-sig")
+    following = path != "-" and stat.S_ISREG(os.fstat(stream.fileno()).st_mode)
+    parser = SrtParser()
+    partial = ""
+    idle_since = time.monotonic()
+    try:
+        while True:
+            line = stream.readline()
+            if not line:
+                if not following or (idle_timeout is not None and time.monotonic() - idle_since > idle_timeout):
+                    break
+                time.sleep(poll_interval)
+                continue
+            idle_since = time.monotonic()
+            if not line.endswith("\n") and following:
+                # The writer is mid-line; wait for the rest of it
+                partial += line
+                continue
+            entry = parser.feed(partial + line)
+            partial = ""
+            if entry is not None:
+                entries.put(entry)
+        if partial:
+            parser.feed(partial)
+        entry = parser.finish()
+        if entry is not None:
+            entries.put(entry)
+    finally:
+        entries.put(None)
+        if stream is not sys.stdin:
+            stream.close()
+
+class StreamingSegmenter:
+    # Accumulates word entries and emits sentences once their boundary is
+    # stable, i.e. once the segmenter has started another sentence after them.
+    # The buffer never holds more than `max_words` entries.
+
+    def __init__(self, segmenter, max_words=400, check_every=8):
+        self.segmenter = segmenter
+        self.max_words = max_words
+        self.check_every = check_every
+        self.words = Words()
+        self.sequence = 0
+        self.pending = 0
+
+    def add(self, entry):
+        start, end, text = entry
+        self.words.append(start, end, text)
+        self.pending += 1
+        ends_sentence = re.search(r'[.!?。！？]["\')\]]*$', text) is not None
+        if ends_sentence or self.pending >= self.check_every or len(self.words) >= self.max_words:
+            self.pending = 0
+            return self.split(final=len(self.words) >= self.max_words)
+        return []
+
+    def flush(self):
+        return self.split(final=True)
+
+    def split(self, final):
+        if not len(self.words):
+            return []
+        combined_text, offsets = build_word_index(self.words.texts)
+        # The word timings go along, as in batch mode, for segmenters that use pauses
+        spans = self.segmenter.ready().segment_words(self.words, combined_text, offsets)
+        mapped = list(zip(spans, map_spans_to_entries(offsets, spans)))
+        if not final:
+            # The last sentence may still grow with the next words
+            mapped = mapped[:-1]
+        sentences = []
+        consumed = 0
+        for (start, end), (first, last) in mapped:
+            sentence = clean_sentence(combined_text[start:end])
+            consumed = last + 1
+            if not sentence:
+                continue
+            self.sequence += 1
+            row = sentence_row(self.sequence, sentence, self.words.starts[first], self.words.ends[last])
+            sentences.append((row, self.words.starts[first]))
+        if final:
+            consumed = len(self.words)
+        self.words.drop(consumed)
+        return sentences
+
+class OnlineAligner:
+    # Sliding-window DTW: the unresolved source and target sentences are
+    # re-aligned whenever new ones arrive, and pairs are committed once both
+    # sentences are `commit_lag` seconds behind the point that both streams
+    # have reached, so one side running ahead cannot force early decisions.
+    # Committed or expired sentences leave the window, so memory stays bounded
+    # by the time horizon rather than the session length.
+
+    def __init__(self, similarity_threshold, time_window=(2, 15), commit_lag=20):
+        self.similarity_threshold = similarity_threshold
+        self.before = time_window[0] * 1000
+        self.after = time_window[1] * 1000
+        self.commit_lag = commit_lag * 1000
+        self.sources = []
+        self.targets = []
+        self.newest_source = 0
+        self.newest_target = 0
+        self.sequence = 0
+
+    def add_source(self, row, start_ms, embedding):
+        self.sources.append((row, start_ms, embedding))
+        self.newest_source = max(self.newest_source, start_ms)
+        return self.advance()
+
+    def add_target(self, row, start_ms, embedding):
+        self.targets.append((row, start_ms, embedding))
+        self.newest_target = max(self.newest_target, start_ms)
+        return self.advance()
+
+    def flush(self):
+        return self.advance(final=True)
+
+    def advance(self, final=False):
+        if not self.sources or not self.targets:
+            return []
+        progress = min(self.newest_source, self.newest_target)
+        horizon = np.inf if final else progress - self.commit_lag
+        source_start = np.array([s[1] for s in self.sources])
+        target_start = np.array([t[1] for t in self.targets])
+        lo, hi = time_window_bounds(source_start, target_start, self.before, self.after)
+        _, path, path_similarity = windowed_path(
+            np.stack([s[2] for s in self.sources]), np.stack([t[2] for t in self.targets]), lo, hi
+        )
+
+        rows = []
+        used_source = used_target = -1
+        for (source_idx, target_idx), similarity in zip(path, path_similarity):
+            if source_start[source_idx] > horizon or target_start[target_idx] > horizon:
+                break
+            if source_idx <= used_source or target_idx <= used_target:
+                continue
+            if similarity >= self.similarity_threshold:
+                rows.append(self.pair_row(self.sources[source_idx], self.targets[target_idx]))
+                used_source, used_target = source_idx, target_idx
+
+        # Drop what is committed, plus sentences no future target can reach
+        keep_source = used_source + 1
+        while keep_source < len(self.sources) and (final or source_start[keep_source] < horizon - self.after):
+            keep_source += 1
+        keep_target = used_target + 1
+        while keep_target < len(self.targets) and (final or target_start[keep_target] < horizon):
+            keep_target += 1
+        del self.sources[:keep_source]
+        del self.targets[:keep_target]
+        return rows
+
+    def pair_row(self, source, target):
+        self.sequence += 1
+        (source_row, source_start, _), (target_row, target_start, _) = source, target
+        evs_ms = target_start - source_start
+        return {
+            'sequence': self.sequence,
+            'source_sentence': source_row[1],
+            'target_sentence': target_row[1],
+            'source_start': source_row[2],
+            'target_start': target_row[2],
+            'EVS': ms_to_time(evs_ms),
+            'EVS_ms': evs_ms,
+        }
+
+def run_stream(source_path, target_path, output_file, source_segmenter, target_segmenter, encoder,
+               similarity_threshold, source_lang=None, target_lang=None, time_window=(2, 15),
+               commit_lag=20, idle_timeout=None):
+    # Both transcripts are read on their own threads so that a blocking pipe
+    # on one side never stalls the other; EVS rows are written as they commit
+    entries = {"source": queue.Queue(), "target": queue.Queue()}
+    for side, path in (("source", source_path), ("target", target_path)):
+        threading.Thread(target=follow_srt, args=(path, entries[side]),
+                         kwargs={"idle_timeout": idle_timeout}, daemon=True).start()
+
+    segmenters = {"source": StreamingSegmenter(source_segmenter), "target": StreamingSegmenter(target_segmenter)}
+    languages = {"source": source_lang, "target": target_lang}
+    aligner = OnlineAligner(similarity_threshold, time_window, commit_lag)
+    open_sides = {"source", "target"}
+
+    with open(output_file, "w", encoding="utf-8", newline="") as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=alignment_columns)
+        writer.writeheader()
+        csvfile.flush()
+
+        def feed(side, sentences):
+            if not sentences:
+                return
+            embeddings = encoder.encode([row[1] for row, _ in sentences], languages[side])
+            add = aligner.add_source if side == "source" else aligner.add_target
+            for (row, start_ms), embedding in zip(sentences, embeddings):
+                writer.writerows(add(row, start_ms, embedding))
+            csvfile.flush()
+
+        while open_sides:
+            idle = True
+            for side in list(open_sides):
+                new_sentences = []
+                while True:
+                    try:
+                        entry = entries[side].get_nowait()
+                    except queue.Empty:
+                        break
+                    idle = False
+                    if entry is None:
+                        new_sentences.extend(segmenters[side].flush())
+                        open_sides.discard(side)
+                        break
+                    new_sentences.extend(segmenters[side].add(entry))
+                feed(side, new_sentences)
+            if idle:
+                time.sleep(0.05)
+
+        writer.writerows(aligner.flush())
+    return output_file
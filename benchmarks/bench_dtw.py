@@ -0,0 +1,70 @@
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from EVS.alignment.dtw import dtw_path, sakoe_chiba_window, similarity_matrix, time_window_bounds, windowed_path
+
+def cosine_similarity(x, y):
+    return np.dot(x, y) / (np.linalg.norm(x) * np.linalg.norm(y))
+
+def make_embeddings(n, dimensions=512, seed=0):
+    # Target sentences are noisy copies of the source with some merged/dropped,
+    # so the optimal path is close to, but not exactly on, the diagonal
+    rng = np.random.default_rng(seed)
+    source = rng.standard_normal((n, dimensions))
+    keep = np.sort(rng.choice(n, size=int(n * 0.9), replace=False))
+    target = source[keep] + 0.8 * rng.standard_normal((len(keep), dimensions))
+    return source, target, keep
+
+def make_start_times(n, keep, seed=0):
+    # Sentences every ~5s; the interpretation lags the source by 1-6s
+    rng = np.random.default_rng(seed)
+    source_start = np.cumsum(rng.integers(2000, 8000, n))
+    target_start = source_start[keep] + rng.integers(1000, 6000, len(keep))
+    return source_start, np.sort(target_start)
+
+def run_fastdtw(source, target):
+    from fastdtw import fastdtw
+    distance, path = fastdtw(source, target, dist=lambda x, y: np.linalg.norm(x - y))
+    return [cosine_similarity(source[i], target[j]) for i, j in path]
+
+def run_matrix(source, target):
+    similarity = similarity_matrix(source, target)
+    _, path = dtw_path(similarity)
+    return similarity[tuple(np.array(path).T)]
+
+def run_band(source, target, band):
+    lo, hi = sakoe_chiba_window(len(source), len(target), band)
+    return windowed_path(source, target, lo, hi)[2]
+
+def run_time_window(source, target, source_start, target_start):
+    lo, hi = time_window_bounds(source_start, target_start, 2000, 15000)
+    return windowed_path(source, target, lo, hi)[2]
+
+def timed(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+if __name__ == "__main__":
+    sizes = [int(n) for n in sys.argv[1:]] or [250, 500, 1000, 2000]
+    try:
+        import fastdtw
+    except ImportError:
+        fastdtw = None
+        print("fastdtw is not installed; only the matrix DTW is timed")
+
+    for n in sizes:
+        source, target, keep = make_embeddings(n)
+        source_start, target_start = make_start_times(n, keep)
+        line = f"n={n:5}:"
+        if fastdtw is not None:
+            line += f"  fastdtw+loop {timed(run_fastdtw, source, target):7.3f}s"
+        line += f"  exact DTW {timed(run_matrix, source, target):7.3f}s"
+        line += f"  banded(50) {timed(run_band, source, target, 50):7.3f}s"
+        line += f"  time window(-2s, +15s) {timed(run_time_window, source, target, source_start, target_start):7.3f}s"
+        print(line)
@@ -0,0 +1,104 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, root)
+
+from EVS.SBD import get_segmenter, read_sentences, read_srt, segment_table
+from EVS.alignment import accept_pairs, alignment_path
+from EVS.alignment.dtw import normalize
+from EVS.alignment.encoders import create_encoder
+from bench_suite import make_pair
+
+# Encoding speed and parity of an *_onnx encoder against its PyTorch fp32
+# backend: the cosine between the two embeddings of every sentence, and how
+# much the aligned pairs and their EVS change when the int8 embeddings are
+# used for alignment.
+
+def synthetic_tables(directory, n_words):
+    pair, _ = make_pair(directory, n_words)
+    return (segment_table(read_srt(pair["source"]), get_segmenter("rule", "en")),
+            segment_table(read_srt(pair["target"]), get_segmenter("rule", "pt")))
+
+def timed_encode(encoder, sentences, language, repeat):
+    best, embeddings = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        embeddings = encoder.embed_batched(sentences, language)
+        best = min(best, time.perf_counter() - start)
+    return best, embeddings
+
+def cosine_drift(fp32, int8):
+    return 1 - np.einsum('ij,ij->i', normalize(fp32), normalize(int8))
+
+def accepted_evs(source, target, source_embeddings, target_embeddings, threshold, time_window):
+    # EVS in milliseconds keyed by the accepted (source, target) sentence pair
+    frames = source.to_frame(), target.to_frame()
+    path, path_similarity, source_start, target_start = alignment_path(*frames, source_embeddings, target_embeddings,
+                                                                       time_window=time_window)
+    return {(i, j): int(target_start[j] - source_start[i]) for i, j in accept_pairs(path, path_similarity, threshold)}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare an ONNX int8 encoder with its PyTorch fp32 backend")
+    parser.add_argument('model', choices=['SBERT', 'XLM_Roberta', 'mT5'], help='PyTorch backend; its _onnx variant is compared with it')
+    parser.add_argument('--source', help='Source sentence file (.csv, .npz or .parquet); a synthetic pair is used by default')
+    parser.add_argument('--target', help='Target sentence file (.csv, .npz or .parquet)')
+    parser.add_argument('--source_language', default='en')
+    parser.add_argument('--target_language', default='pt')
+    parser.add_argument('--words', type=int, default=3000, help='Words in the synthetic source transcript')
+    parser.add_argument('--batch_size', type=int, default=32)
+    parser.add_argument('--repeat', type=int, default=3, help='Encoding runs per backend; the fastest one is kept')
+    parser.add_argument('--similarity_threshold', type=float, default=0.5)
+    parser.add_argument('--time_window', type=float, nargs=2, default=(2, 15), metavar=('BEFORE', 'AFTER'))
+    parser.add_argument('--max_drift', type=float, default=0.02, help='Exit with status 1 if the mean cosine drift is larger')
+    args = parser.parse_args()
+
+    if args.source:
+        source, target = read_sentences(args.source), read_sentences(args.target)
+    else:
+        with tempfile.TemporaryDirectory() as directory:
+            source, target = synthetic_tables(directory, args.words)
+    sentences = len(source) + len(target)
+
+    results = {}
+    for name in (args.model, f"{args.model}_onnx"):
+        encoder = create_encoder(name, batch_size=args.batch_size)
+        start = time.perf_counter()
+        encoder.ready()
+        load = time.perf_counter() - start
+        source_seconds, source_embeddings = timed_encode(encoder, source.sentences, args.source_language, args.repeat)
+        target_seconds, target_embeddings = timed_encode(encoder, target.sentences, args.target_language, args.repeat)
+        seconds = source_seconds + target_seconds
+        results[name] = (seconds, source_embeddings, target_embeddings)
+        print(f"{name:18} load {load:6.2f}s  encode {seconds:7.3f}s  {sentences / seconds:8.1f} sentences/s")
+
+    fp32_seconds, fp32_source, fp32_target = results[args.model]
+    int8_seconds, int8_source, int8_target = results[f"{args.model}_onnx"]
+    drift = np.concatenate([cosine_drift(fp32_source, int8_source), cosine_drift(fp32_target, int8_target)])
+    print(f"speedup {fp32_seconds / int8_seconds:.2f}x")
+    print(f"cosine drift: mean {drift.mean():.5f}  p99 {np.percentile(drift, 99):.5f}  max {drift.max():.5f}")
+
+    fp32_pairs = accepted_evs(source, target, fp32_source, fp32_target, args.similarity_threshold, args.time_window)
+    int8_pairs = accepted_evs(source, target, int8_source, int8_target, args.similarity_threshold, args.time_window)
+    common = fp32_pairs.keys() & int8_pairs.keys()
+    print(f"aligned pairs: fp32 {len(fp32_pairs)}, int8 {len(int8_pairs)}, in common {len(common)}")
+    if fp32_pairs and int8_pairs:
+        fp32_mean = np.mean(list(fp32_pairs.values())) / 1000
+        int8_mean = np.mean(list(int8_pairs.values())) / 1000
+        print(f"mean EVS: fp32 {fp32_mean:.3f}s, int8 {int8_mean:.3f}s, difference {int8_mean - fp32_mean:+.3f}s")
+        # Source sentences aligned in both runs, possibly to different targets
+        fp32_by_source = {i: evs for (i, j), evs in fp32_pairs.items()}
+        int8_by_source = {i: evs for (i, j), evs in int8_pairs.items()}
+        shared = sorted(fp32_by_source.keys() & int8_by_source.keys())
+        if shared:
+            difference = np.abs([int8_by_source[i] - fp32_by_source[i] for i in shared]) / 1000
+            print(f"EVS per source sentence ({len(shared)} aligned in both): {np.mean(difference == 0):.1%} unchanged, "
+                  f"mean |difference| {difference.mean():.3f}s, max {difference.max():.3f}s")
+    if drift.mean() > args.max_drift:
+        print(f"Mean cosine drift is above {args.max_drift}")
+        sys.exit(1)
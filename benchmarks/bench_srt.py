@@ -0,0 +1,44 @@
+import os
+import sys
+import tempfile
+import time
+
+root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, root)
+
+from EVS.SBD.srt import iter_srt, read_srt
+from bench_word_index import make_subtitles
+from bench_workers import write_srt
+
+def parse_pysrt(path):
+    # The previous parse_srt: pysrt objects, then datetime.time per entry
+    import pysrt
+    return [{"index": sub.index, "start": sub.start.to_time(), "end": sub.end.to_time(), "text": sub.text}
+            for sub in pysrt.open(path)]
+
+def count_iter(path):
+    return sum(1 for _ in iter_srt(path))
+
+def timed(func, path):
+    start = time.perf_counter()
+    result = func(path)
+    return time.perf_counter() - start, result if isinstance(result, int) else len(result)
+
+if __name__ == "__main__":
+    n_entries = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "synthetic.word.srt")
+        write_srt(path, make_subtitles(n_entries))
+        size_mb = os.path.getsize(path) / 1e6
+        print(f"{n_entries} entries, {size_mb:.1f} MB")
+
+        candidates = [("read_srt (arrays)", read_srt), ("iter_srt (generator)", count_iter)]
+        try:
+            import pysrt
+            candidates.insert(0, ("pysrt + to_time", parse_pysrt))
+        except ImportError:
+            print("pysrt is not installed; only the new reader is timed")
+
+        for label, func in candidates:
+            elapsed, count = timed(func, path)
+            print(f"{label:22} {elapsed:6.3f}s  {count / elapsed:10.0f} entries/s  {size_mb / elapsed:6.1f} MB/s")
@@ -0,0 +1,39 @@
+import os
+import re
+import subprocess
+import sys
+
+# Startup budget for `main.py --help`, measured with -X importtime. Exits
+# non-zero when a heavy framework is imported eagerly or the budget is exceeded.
+root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+budget_ms = 300
+forbidden = ['torch', 'tensorflow', 'tensorflow_hub', 'transformers', 'sentence_transformers',
+             'laserembeddings', 'spacy', 'stanza', 'nltk', 'pandas', 'numpy', 'fastdtw']
+
+def measure(argv):
+    result = subprocess.run([sys.executable, "-X", "importtime", *argv], cwd=root, capture_output=True, text=True)
+    imported = []
+    total_us = 0
+    for line in result.stderr.splitlines():
+        match = re.match(r"import time:\s+\d+\s+\|\s+(\d+)\s+\|( *)(\S+)", line)
+        if match:
+            imported.append(match.group(3))
+            # Only outermost imports are summed; their cumulative time covers the nested ones
+            if len(match.group(2)) == 1:
+                total_us += int(match.group(1))
+    return imported, total_us / 1000
+
+if __name__ == "__main__":
+    imported, total_ms = measure(["main.py", "--help"])
+    top_level = {name.split('.')[0] for name in imported}
+    eager = sorted(set(forbidden) & top_level)
+
+    print(f"main.py --help imports: {len(imported)} modules, {total_ms:.1f}ms (budget {budget_ms}ms)")
+    if eager:
+        print(f"FAIL: heavy modules imported at startup: {', '.join(eager)}")
+        sys.exit(1)
+    if total_ms > budget_ms:
+        print("FAIL: startup import time over budget")
+        sys.exit(1)
+    print("OK")
@@ -0,0 +1,225 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import zlib
+
+import numpy as np
+
+root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, root)
+
+from EVS import profiling
+from EVS.SBD import get_segmenter, read_sentences, read_srt, segment_table, write_sentences
+from EVS.alignment import align_embeddings, align_pair, sweep_thresholds, threshold_grid
+from EVS.alignment.encoders import Encoder
+from EVS.pipeline import Pipeline
+from bench_word_index import make_subtitles, reconstruct_indexed, reconstruct_scan
+from bench_workers import write_srt
+
+default_baseline = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+class TinyEncoder(Encoder):
+    # Deterministic hashed bag-of-words embedding: no download, no GPU, and
+    # the same vectors in every process (crc32 instead of the salted hash())
+    name = 'tiny'
+    dimensions = 64
+
+    def load(self):
+        return np.random.default_rng(0).standard_normal((1024, self.dimensions)).astype(np.float32)
+
+    def embed(self, sentences, language):
+        embeddings = np.zeros((len(sentences), self.dimensions), dtype=np.float32)
+        for i, sentence in enumerate(sentences):
+            rows = [zlib.crc32(word.strip('.,').encode()) % len(self.model) for word in sentence.split()]
+            if rows:
+                embeddings[i] = self.model[rows].sum(axis=0)
+        return embeddings
+
+def interpretation(subtitles, lag_ms=2500, drop=0.05, seed=1):
+    # The target repeats the source words lag_ms later with a few dropped,
+    # so the alignment has real matches to find
+    rng = random.Random(seed)
+    target = []
+    for sub in subtitles:
+        if rng.random() < drop and not sub["text"].endswith("."):
+            continue
+        target.append(dict(sub, index=len(target) + 1, start=shift(sub["start"], lag_ms), end=shift(sub["end"], lag_ms)))
+    return target
+
+def shift(value, ms):
+    total = ((value.hour * 60 + value.minute) * 60 + value.second) * 1000 + value.microsecond // 1000 + ms
+    return value.replace(hour=total // 3600000, minute=(total // 60000) % 60, second=(total // 1000) % 60,
+                         microsecond=(total % 1000) * 1000)
+
+def make_pair(directory, n_words, seed=0):
+    source = make_subtitles(n_words, seed=seed)
+    pair = {"name": f"synthetic{seed}", "source": os.path.join(directory, f"synthetic{seed}_en.word.srt"),
+            "target": os.path.join(directory, f"synthetic{seed}_pt.word.srt")}
+    write_srt(pair["source"], source)
+    write_srt(pair["target"], interpretation(source, seed=seed + 1))
+    return pair, source
+
+def best_of(repeat, func, *args):
+    # Like timeit: the garbage collector is paused while a run is timed.
+    # Returns the time and the result of the fastest run.
+    best = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        gc.disable()
+        try:
+            started = time.perf_counter()
+            result = func(*args)
+            elapsed = time.perf_counter() - started
+        finally:
+            gc.enable()
+        if elapsed < best:
+            best, best_result = elapsed, result
+    return best, best_result
+
+def run_suite(n_words, repeat):
+    results = {}
+
+    def record(case, seconds, items, unit):
+        results[case] = {"seconds": round(seconds, 5), unit: items, f"{unit}_per_second": round(items / seconds, 1)}
+
+    with tempfile.TemporaryDirectory() as directory:
+        pair, subtitles = make_pair(directory, n_words)
+
+        seconds, words = best_of(repeat, read_srt, pair["source"])
+        record("srt_parse", seconds, len(words), "words")
+
+        seconds, _ = best_of(repeat, reconstruct_scan, subtitles)
+        record("find_timestamp_scan", seconds, len(words), "words")
+        seconds, _ = best_of(repeat, reconstruct_indexed, subtitles)
+        record("find_timestamp_indexed", seconds, len(words), "words")
+
+        for name in ("rule", "pause"):
+            segmenter = get_segmenter(name, "en").ready()
+            seconds, table = best_of(repeat, segment_table, words, segmenter)
+            record(f"reconstruct_sentences_{name}", seconds, len(words), "words")
+
+        source = segment_table(words, get_segmenter("rule", "en"))
+        target = segment_table(read_srt(pair["target"]), get_segmenter("rule", "pt"))
+        encoder = TinyEncoder(batch_size=64).ready()
+        seconds, source_embeddings = best_of(repeat, encoder.encode, source.sentences, "en")
+        record("encode_tiny", seconds, len(source), "sentences")
+        target_embeddings = encoder.encode(target.sentences, "pt")
+
+        source_df, target_df = source.to_frame(), target.to_frame()
+        for case, options in (("align_full", {}), ("align_band", {"band": 50}), ("align_time_window", {"time_window": (2, 15)})):
+            seconds, aligned = best_of(repeat, lambda: align_embeddings(source_df, target_df, source_embeddings,
+                                                                        target_embeddings, 0.5, **options))
+            record(case, seconds, len(source) + len(target), "sentences")
+            results[case]["aligned_pairs"] = len(aligned)
+
+        seconds, aligned = best_of(repeat, align_pair, source_df, target_df, source_embeddings, target_embeddings,
+                                   0.5, None, (2, 15), "anchors")
+        record("align_anchors", seconds, len(source) + len(target), "sentences")
+        results["align_anchors"]["aligned_pairs"] = len(aligned)
+
+        # The 66 thresholds of the default grid from one DTW path
+        thresholds = threshold_grid()
+        seconds, _ = best_of(repeat, sweep_thresholds, source_df, target_df, source_embeddings, target_embeddings,
+                             thresholds, None, (2, 15))
+        record("sweep_time_window", seconds, len(thresholds), "thresholds")
+
+        source.embeddings, source.embedding_model = source_embeddings, "tiny@main/en"
+        for extension in (".csv", ".npz"):
+            path = os.path.join(directory, "sentences" + extension)
+            seconds, _ = best_of(repeat, write_sentences, path, source)
+            record(f"{extension[1:]}_write", seconds, len(source), "sentences")
+            seconds, _ = best_of(repeat, read_sentences, path)
+            record(f"{extension[1:]}_read", seconds, len(source), "sentences")
+
+        # One whole pair through the batch pipeline, with its stage breakdown
+        pipeline = Pipeline("rule", "en", "pt", "bench_suite:TinyEncoder",
+                            0.5, time_window=(2, 15)).load()
+
+        def profiled_pair():
+            profiler = profiling.start()
+            try:
+                return pipeline.process_pair(pair, directory), profiler.stages
+            finally:
+                profiling.active = None
+
+        seconds, (row, stages) = best_of(repeat, profiled_pair)
+        record("pipeline_pair", seconds, len(words), "words")
+        results["pipeline_pair"]["aligned_pairs"] = row["aligned_pairs"]
+        results["pipeline_pair"]["stages"] = {name: round(stage["wall_seconds"], 5) for name, stage in stages.items()}
+
+        # The same pair with a new threshold: segmentation and encoding come
+        # from a warm stage cache and only the alignment runs
+        stage_cache = os.path.join(directory, "stages")
+        Pipeline("rule", "en", "pt", "bench_suite:TinyEncoder", 0.5, time_window=(2, 15),
+                 stage_cache=stage_cache).process_pair(pair, directory)
+        pipeline = Pipeline("rule", "en", "pt", "bench_suite:TinyEncoder", 0.6, time_window=(2, 15),
+                            stage_cache=stage_cache, force=("alignment",))
+        seconds, row = best_of(repeat, pipeline.process_pair, pair, directory)
+        record("pipeline_pair_stage_cache", seconds, len(words), "words")
+        results["pipeline_pair_stage_cache"]["reused_stages"] = row["reused_stages"]
+    return results
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpus": os.cpu_count(),
+    }
+
+def compare(results, baseline, tolerance, noise=0.005):
+    # A case regresses when it is more than `tolerance` slower than the
+    # baseline and by more than `noise` seconds, so that millisecond-scale
+    # cases do not fail on timer jitter
+    regressions = []
+    print(f"{'case':28} {'baseline':>10} {'now':>10} {'ratio':>7}")
+    for case, result in results.items():
+        before = baseline["results"].get(case)
+        if before is None:
+            print(f"{case:28} {'-':>10} {result['seconds']:10.4f}")
+            continue
+        ratio = result["seconds"] / before["seconds"]
+        flag = "  slower" if ratio > 1 + tolerance and result["seconds"] - before["seconds"] > noise else ""
+        print(f"{case:28} {before['seconds']:10.4f} {result['seconds']:10.4f} {ratio:7.2f}{flag}")
+        if flag:
+            regressions.append(case)
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time the SBD and alignment hot paths on synthetic data")
+    parser.add_argument('--words', type=int, default=20000, help='Words in the synthetic source transcript')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per case; the fastest one is kept')
+    parser.add_argument('--output', help='Write the results to this JSON file, e.g. benchmarks/baseline.json')
+    parser.add_argument('--baseline', default=default_baseline, help='Results to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Slowdown ratio above which a case is reported as a regression')
+    args = parser.parse_args()
+
+    report = {
+        "environment": environment(),
+        "parameters": {"words": args.words, "repeat": args.repeat},
+        "results": run_suite(args.words, args.repeat),
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as jsonfile:
+            json.dump(report, jsonfile, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.baseline and os.path.exists(args.baseline) and os.path.abspath(args.baseline) != os.path.abspath(args.output or ""):
+        with open(args.baseline, encoding="utf-8") as jsonfile:
+            baseline = json.load(jsonfile)
+        if baseline["parameters"] != report["parameters"]:
+            print(f"Baseline was recorded with {baseline['parameters']}; ratios are not comparable")
+        regressions = compare(report["results"], baseline, args.tolerance)
+        if regressions:
+            print(f"Slower than the baseline: {', '.join(regressions)}")
+            sys.exit(1)
+    else:
+        for case, result in report["results"].items():
+            print(f"{case:28} {result['seconds']:10.4f}s")
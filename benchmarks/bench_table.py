@@ -0,0 +1,58 @@
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, root)
+
+from EVS.SBD.table import SentenceTable, read_sentences, write_sentences
+from EVS.alignment.core import to_milliseconds
+
+vocabulary = ["the", "interpreter", "said", "that", "we", "consider", "a", "new", "policy", "for", "growth", "région"]
+
+def make_table(n_sentences, dimensions):
+    rng = np.random.default_rng(0)
+    sentences = [" ".join(vocabulary[j] for j in rng.integers(0, len(vocabulary), 12)) + "." for _ in range(n_sentences)]
+    starts = np.arange(n_sentences, dtype=np.int64) * 4000
+    return SentenceTable(sentences, starts, starts + 3500,
+                         embeddings=rng.normal(size=(n_sentences, dimensions)).astype(np.float32),
+                         embedding_model="synthetic@main/en")
+
+def load_csv(path):
+    # What the alignment stage did before: parse the CSV, then the time strings
+    df = pd.read_csv(path)
+    return df["sentence"].tolist(), to_milliseconds(df["start"])
+
+def load_table(path):
+    table = read_sentences(path)
+    return table.sentences, table.start_ms, table.embeddings
+
+def timed(func, path, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(path)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+if __name__ == "__main__":
+    n_sentences = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    dimensions = int(sys.argv[2]) if len(sys.argv) > 2 else 512
+    table = make_table(n_sentences, dimensions)
+    with tempfile.TemporaryDirectory() as directory:
+        print(f"{n_sentences} sentences, {dimensions}-dimensional embeddings")
+        candidates = [("csv (no embeddings)", ".csv", load_csv), ("npz (with embeddings)", ".npz", load_table)]
+        try:
+            import pyarrow
+            candidates.append(("parquet (with embeddings)", ".parquet", load_table))
+        except ImportError:
+            print("pyarrow is not installed; parquet is skipped")
+        for label, extension, load in candidates:
+            path = os.path.join(directory, "sentences" + extension)
+            write_sentences(path, table)
+            size_mb = os.path.getsize(path) / 1e6
+            print(f"{label:26} {timed(load, path):6.3f}s  {size_mb:7.1f} MB")
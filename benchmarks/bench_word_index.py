@@ -0,0 +1,76 @@
+import os
+import random
+import re
+import sys
+import time
+from datetime import time as dtime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "EVS", "SBD"))
+
+from word_index import build_word_index, find_sentence_spans, map_spans_to_entries
+
+WORDS = ["the", "interpreter", "said", "that", "we", "should", "consider", "a", "new", "policy",
+         "for", "economic", "growth", "in", "our", "region", "and", "this", "is", "important"]
+
+def make_subtitles(n_words, seed=0):
+    rng = random.Random(seed)
+    subtitles = []
+    ms = 0
+    for i in range(n_words):
+        word = rng.choice(WORDS)
+        if rng.random() < 0.07:
+            word += "."
+        start = ms
+        ms += rng.randint(150, 600)
+        subtitles.append({"index": i + 1, "start": ms_to_time(start), "end": ms_to_time(ms), "text": word})
+        ms += rng.randint(0, 300)
+    return subtitles
+
+def ms_to_time(ms):
+    return dtime(ms // 3600000, (ms // 60000) % 60, (ms // 1000) % 60, (ms % 1000) * 1000)
+
+def split_sentences(text):
+    # Stand-in for nltk.sent_tokenize so the benchmark runs offline
+    return re.findall(r"[^.]+\.?", text)
+
+def find_timestamp(subtitles, text, word_index):
+    for sub in subtitles[word_index:]:
+        if text in sub["text"]:
+            return sub["start"], sub["end"], sub["index"]
+    return None, None, None
+
+def reconstruct_scan(subtitles):
+    combined_text = " ".join([s["text"] for s in subtitles])
+    rows = []
+    word_index = 0
+    for sent in split_sentences(combined_text):
+        words = sent.split()
+        if not words:
+            continue
+        start_time, _, _ = find_timestamp(subtitles, words[0], word_index)
+        _, end_time, end_index = find_timestamp(subtitles, words[-1], word_index)
+        if start_time and end_time:
+            rows.append((start_time, end_time))
+            word_index = end_index
+    return rows
+
+def reconstruct_indexed(subtitles):
+    combined_text, offsets = build_word_index([s["text"] for s in subtitles])
+    spans = find_sentence_spans(combined_text, split_sentences(combined_text))
+    return [(subtitles[first]["start"], subtitles[last]["end"])
+            for first, last in map_spans_to_entries(offsets, spans)]
+
+def timed(func, subtitles):
+    start = time.perf_counter()
+    rows = func(subtitles)
+    return time.perf_counter() - start, len(rows)
+
+if __name__ == "__main__":
+    n_words = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    subtitles = make_subtitles(n_words)
+    scan_time, scan_rows = timed(reconstruct_scan, subtitles)
+    index_time, index_rows = timed(reconstruct_indexed, subtitles)
+    print(f"words: {n_words}")
+    print(f"find_timestamp scan: {scan_time:.3f}s ({scan_rows} sentences)")
+    print(f"word index:          {index_time:.3f}s ({index_rows} sentences)")
+    print(f"speedup:             {scan_time / index_time:.1f}x")
@@ -0,0 +1,78 @@
+import os
+import sys
+import tempfile
+import time
+import zlib
+
+import numpy as np
+
+root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, root)
+
+from EVS.alignment.encoders import Encoder
+from EVS.pipeline import Pipeline, run_batch
+from bench_word_index import make_subtitles
+
+class StandInEncoder(Encoder):
+    # Deterministic bag-of-words projection with a fixed amount of CPU work per
+    # sentence, standing in for a transformer encoder without any download;
+    # words are hashed with crc32, since hash() is salted per process
+    name = 'stand-in'
+    dimensions = 256
+
+    def load(self):
+        return np.random.default_rng(0).standard_normal((4096, self.dimensions))
+
+    def embed(self, sentences, language):
+        embeddings = np.zeros((len(sentences), self.dimensions))
+        for i, sentence in enumerate(sentences):
+            rows = [zlib.crc32(word.encode()) % len(self.model) for word in sentence.split()]
+            vector = self.model[rows].sum(axis=0)
+            for _ in range(20):
+                vector = np.tanh(vector @ self.model[:self.dimensions] / self.dimensions)
+            embeddings[i] = vector
+        return embeddings
+
+def format_time(ms):
+    return f"{ms // 3600000:02}:{(ms // 60000) % 60:02}:{(ms // 1000) % 60:02},{ms % 1000:03}"
+
+def write_srt(path, subtitles):
+    with open(path, "w", encoding="utf-8") as f:
+        for sub in subtitles:
+            start = sub["start"]
+            end = sub["end"]
+            start_ms = ((start.hour * 60 + start.minute) * 60 + start.second) * 1000 + start.microsecond // 1000
+            end_ms = ((end.hour * 60 + end.minute) * 60 + end.second) * 1000 + end.microsecond // 1000
+            f.write(f"{sub['index']}\n{format_time(start_ms)} --> {format_time(end_ms)}\n{sub['text']}\n\n")
+
+def make_pairs(directory, n_pairs, n_words):
+    pairs = []
+    for i in range(n_pairs):
+        source = os.path.join(directory, f"pair{i:03}_en.word.srt")
+        target = os.path.join(directory, f"pair{i:03}_pt.word.srt")
+        write_srt(source, make_subtitles(n_words, seed=i))
+        write_srt(target, make_subtitles(n_words, seed=i + 1000))
+        pairs.append({"name": f"pair{i:03}", "source": source, "target": target})
+    return pairs
+
+if __name__ == "__main__":
+    n_pairs = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    n_words = int(sys.argv[2]) if len(sys.argv) > 2 else 3000
+    cpus = os.cpu_count() or 1
+    worker_counts = sorted({1, 2, 4, cpus} & set(range(1, cpus + 1)))
+
+    with tempfile.TemporaryDirectory() as directory:
+        pairs = make_pairs(directory, n_pairs, n_words)
+        args = ('rule', 'en', 'pt', 'bench_workers:StandInEncoder', 0.5)
+        print(f"{n_pairs} pairs of {n_words} words, {cpus} CPUs")
+        for workers in worker_counts:
+            started = time.perf_counter()
+            with open(os.devnull, "w") as devnull:
+                stdout, sys.stdout = sys.stdout, devnull
+                try:
+                    rows = run_batch(pairs, os.path.join(directory, f"out{workers}"), Pipeline(*args), workers)
+                finally:
+                    sys.stdout = stdout
+            elapsed = time.perf_counter() - started
+            failed = sum(row["status"] != "ok" for row in rows)
+            print(f"workers={workers}: {n_pairs / elapsed * 60:.1f} pairs/minute ({elapsed:.2f}s, {failed} failed)")
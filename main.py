@@ -1,59 +1,374 @@
 import argparse
-import punkt_en
-import punkt_pt
-import spacy_en
-import spacy_pt
-import stanza_en
-import stanza_pt
-import LASER
-import mT5
-import SBERT
-import USE
-import XLM_Roberta
-
-def main():
-    parser = argparse.ArgumentParser(description="Automated EVS Measurement")
-    parser.add_argument('--sbd_model', choices=['punkt', 'spacy', 'stanza'], required=True, help='Model for sentence boundary detection')
+import json
+import os
+import sys
+
+from EVS.registry import alignment_backends, sbd_backends
+
+# Shared by every entry point, so the same input aligns the same way in each
+default_similarity_threshold = 0.5
+
+def use_model_server(address):
+    # Read by get_segmenter and get_encoder, and inherited by worker processes
+    if address:
+        os.environ['EVS_MODEL_SERVER'] = address
+
+def pause_value(value):
+    # MS for every language or LANGUAGE=MS for one
+    language, _, number = value.rpartition('=')
+    if not number.isdigit() or (language and not language.isalpha()):
+        raise argparse.ArgumentTypeError(f"expected MS or LANGUAGE=MS, got {value}")
+    return value
+
+def stage_cache_directory(args):
+    # The stage cache is on unless --no_stage_cache is given
+    if args.no_stage_cache:
+        return None
+    from EVS.stage_cache import cache_directory
+    return args.stage_cache or cache_directory()
+
+def forced_stages(force):
+    # `--force` without stage names recomputes every stage
+    from EVS.stage_cache import stage_names
+    if force is None:
+        return ()
+    return tuple(force) or stage_names
+
+def batch_main(argv):
+    parser = argparse.ArgumentParser(prog="main.py batch", description="Run SBD, alignment and EVS over a corpus of interpreting pairs")
+    parser.add_argument('manifest', help='CSV with source and target .word.srt columns and an optional name column')
+    parser.add_argument('--sbd_model', choices=list(sbd_backends), default='stanza', help='Model for sentence boundary detection')
+    parser.add_argument('--sbd_processes', type=int, default=1, help='Processes spaCy uses to segment chunks of one transcript')
+    parser.add_argument('--pause_ms', nargs='+', type=pause_value, metavar='MS',
+                        help='Silence that ends a sentence for the pause segmenter, and where spaCy and Stanza cut chunks; MS for every language or LANGUAGE=MS, e.g. 1800 pt=1500')
+    parser.add_argument('--punctuation_pause_ms', nargs='+', type=pause_value, metavar='MS',
+                        help='Silence the pause segmenter requires after final punctuation; MS for every language or LANGUAGE=MS')
+    parser.add_argument('--source_language', default='en', help='Language code of the source speeches')
+    parser.add_argument('--target_language', default='pt', help='Language code of the interpretations')
+    parser.add_argument('--alignment_model', choices=list(alignment_backends), default='USE', help='Model for cross-lingual alignment')
+    parser.add_argument('--output_directory', required=True, help='Directory for per-pair CSVs and corpus_summary.csv')
+    parser.add_argument('--similarity_threshold', type=float, default=default_similarity_threshold, help='Similarity threshold for aligning sentences')
+    parser.add_argument('--dtw_band', type=int, help='Sakoe-Chiba band radius (in sentences) for DTW; the full grid is searched by default')
+    parser.add_argument('--time_window', type=float, nargs=2, metavar=('BEFORE', 'AFTER'),
+                        help='Only align target sentences starting BEFORE seconds before to AFTER seconds after the source sentence, e.g. 2 15')
+    parser.add_argument('--aligner', choices=['dtw', 'anchors'], default='dtw',
+                        help='dtw pairs sentences one to one; anchors also aligns sentences the interpreter merged or split (time window default 2 15)')
+    parser.add_argument('--batch_size', type=int, default=32, help='Sentences per encoder batch; batches are grouped by length')
+    parser.add_argument('--embedding_cache', help='SQLite file that stores sentence embeddings across runs')
+    parser.add_argument('--cache_size_mb', type=int, default=1024, help='Size limit of the embedding cache; least recently used entries are evicted')
+    parser.add_argument('--workers', type=int, default=1, help='Number of worker processes, each with its own resident models')
+    parser.add_argument('--intermediate', choices=['csv', 'npz', 'parquet'], default='csv',
+                        help='Format of the segmented sentence files; npz and parquet store int64 times and embeddings for fast re-runs')
+    parser.add_argument('--model_server', metavar='SOCKET', help='Use the models kept loaded by `main.py serve` on this socket')
+    parser.add_argument('--stage_cache', metavar='DIRECTORY',
+                        help='Where segmented tables, embeddings and alignments are stored by the fingerprint of their inputs (default ~/.cache/evs/stages)')
+    parser.add_argument('--no_stage_cache', action='store_true', help='Run every stage and store nothing')
+    parser.add_argument('--stage_cache_size_mb', type=int, default=4096,
+                        help='Size limit of the stage cache; least recently used artifacts are removed')
+    parser.add_argument('--force', nargs='*', choices=['segmentation', 'encoding', 'alignment'], metavar='STAGE',
+                        help='Recompute these stages (segmentation, encoding, alignment) even if they are stored; all of them without a STAGE')
+    parser.add_argument('--profile', nargs='?', const='evs_profile.json', metavar='REPORT',
+                        help='Write wall time, CPU time, peak RSS and counts per stage to a JSON report (default evs_profile.json)')
+    parser.add_argument('--profile_stage', metavar='STAGE',
+                        help='Also run one stage (e.g. encoding, dtw, segmentation) under cProfile and dump it next to the report')
+
+    args = parser.parse_args(argv)
+    use_model_server(args.model_server)
+
+    from EVS.pipeline import Pipeline, read_manifest, run_batch
+    from EVS.profiling import profiled
+
+    with profiled(args.profile, args.profile_stage, ['batch'] + argv):
+        # Every model is loaded once and reused for all pairs in the manifest
+        pipeline = Pipeline(args.sbd_model, args.source_language, args.target_language,
+                            args.alignment_model, args.similarity_threshold,
+                            args.embedding_cache, args.cache_size_mb, args.dtw_band, args.time_window,
+                            args.batch_size, args.sbd_processes, args.intermediate, args.aligner,
+                            stage_cache_directory(args), forced_stages(args.force), args.pause_ms, args.punctuation_pause_ms,
+                            args.stage_cache_size_mb)
+        run_batch(read_manifest(args.manifest), args.output_directory, pipeline, args.workers)
+
+def stream_main(argv):
+    parser = argparse.ArgumentParser(prog="main.py stream", description="Compute EVS incrementally while the transcripts are being written")
+    parser.add_argument('source', help='Growing source .word.srt file, a pipe, or - for stdin')
+    parser.add_argument('target', help='Growing target .word.srt file, a pipe, or - for stdin')
+    parser.add_argument('--output_file', default='Alignment_EVS.csv', help='CSV that EVS rows are appended to as they are committed')
+    parser.add_argument('--sbd_model', choices=list(sbd_backends), default='stanza', help='Model for sentence boundary detection')
+    parser.add_argument('--pause_ms', nargs='+', type=pause_value, metavar='MS',
+                        help='Silence that ends a sentence for the pause segmenter, and where spaCy and Stanza cut chunks; MS for every language or LANGUAGE=MS, e.g. 1800 pt=1500')
+    parser.add_argument('--punctuation_pause_ms', nargs='+', type=pause_value, metavar='MS',
+                        help='Silence the pause segmenter requires after final punctuation; MS for every language or LANGUAGE=MS')
+    parser.add_argument('--source_language', default='en', help='Language code of the source speech')
+    parser.add_argument('--target_language', default='pt', help='Language code of the interpretation')
+    parser.add_argument('--alignment_model', choices=list(alignment_backends), default='USE', help='Model for cross-lingual alignment')
+    parser.add_argument('--similarity_threshold', type=float, default=default_similarity_threshold, help='Similarity threshold for aligning sentences')
+    parser.add_argument('--time_window', type=float, nargs=2, metavar=('BEFORE', 'AFTER'), default=(2, 15),
+                        help='Target sentences may start BEFORE seconds before to AFTER seconds after their source sentence')
+    parser.add_argument('--commit_lag', type=float, default=20, help='Seconds behind the newest target sentence at which pairs become final')
+    parser.add_argument('--idle_timeout', type=float, default=30, help='Stop following a file after it has not grown for this many seconds')
+    parser.add_argument('--batch_size', type=int, default=32, help='Sentences per encoder batch; batches are grouped by length')
+    parser.add_argument('--embedding_cache', help='SQLite file that stores sentence embeddings across runs')
+    parser.add_argument('--model_server', metavar='SOCKET', help='Use the models kept loaded by `main.py serve` on this socket')
+
+    args = parser.parse_args(argv)
+    use_model_server(args.model_server)
+
+    from EVS.SBD import get_segmenter, pause_options
+    from EVS.alignment import EmbeddingCache, get_encoder
+    from EVS.streaming import run_stream
+
+    source_segmenter = get_segmenter(args.sbd_model, args.source_language,
+                                     **pause_options(args.source_language, args.pause_ms, args.punctuation_pause_ms)).ready()
+    target_segmenter = get_segmenter(args.sbd_model, args.target_language,
+                                     **pause_options(args.target_language, args.pause_ms, args.punctuation_pause_ms)).ready()
+    cache = EmbeddingCache(args.embedding_cache) if args.embedding_cache else None
+    encoder = get_encoder(args.alignment_model, cache, args.batch_size).ready()
+    run_stream(args.source, args.target, args.output_file, source_segmenter, target_segmenter, encoder,
+               args.similarity_threshold, args.source_language, args.target_language,
+               args.time_window, args.commit_lag, args.idle_timeout)
+
+def sweep_main(argv):
+    parser = argparse.ArgumentParser(prog="main.py sweep", description="Score a grid of similarity thresholds from one encoding and one DTW alignment")
+    parser.add_argument('source', help='Source sentence file (.csv, .npz or .parquet) from SBD')
+    parser.add_argument('target', help='Target sentence file (.csv, .npz or .parquet) from SBD')
+    parser.add_argument('--alignment_model', choices=list(alignment_backends), default='USE', help='Model for cross-lingual alignment')
+    parser.add_argument('--source_language', default='en', help='Language code of the source sentences')
+    parser.add_argument('--target_language', default='pt', help='Language code of the target sentences')
+    parser.add_argument('--thresholds', type=float, nargs=3, metavar=('START', 'STOP', 'STEP'), default=(0.3, 0.95, 0.01),
+                        help='Grid of similarity thresholds, STOP included (default 0.3 0.95 0.01)')
+    parser.add_argument('--reference', help='CSV of manual EVS with source_start and EVS (seconds or HH:MM:SS,mmm) or EVS_ms columns')
+    parser.add_argument('--tolerance', type=float, default=1.0, help='Seconds between source starts within which a pair matches a reference row')
+    parser.add_argument('--output_file', default='threshold_sweep.csv', help='CSV with one row per threshold')
+    parser.add_argument('--dtw_band', type=int, help='Sakoe-Chiba band radius (in sentences) for DTW; the full grid is searched by default')
+    parser.add_argument('--time_window', type=float, nargs=2, metavar=('BEFORE', 'AFTER'),
+                        help='Only align target sentences starting BEFORE seconds before to AFTER seconds after the source sentence, e.g. 2 15')
+    parser.add_argument('--batch_size', type=int, default=32, help='Sentences per encoder batch; batches are grouped by length')
+    parser.add_argument('--embedding_cache', help='SQLite file that stores sentence embeddings across runs')
+    parser.add_argument('--model_server', metavar='SOCKET', help='Use the models kept loaded by `main.py serve` on this socket')
+    parser.add_argument('--profile', nargs='?', const='evs_profile.json', metavar='REPORT',
+                        help='Write wall time, CPU time, peak RSS and counts per stage to a JSON report (default evs_profile.json)')
+    parser.add_argument('--profile_stage', metavar='STAGE',
+                        help='Also run one stage (e.g. encoding, dtw, sweep) under cProfile and dump it next to the report')
+
+    args = parser.parse_args(argv)
+    use_model_server(args.model_server)
+
+    from EVS.alignment import EmbeddingCache, get_encoder, sweep_sentences, threshold_grid
+    from EVS.profiling import profiled
+
+    with profiled(args.profile, args.profile_stage, ['sweep'] + argv):
+        cache = EmbeddingCache(args.embedding_cache) if args.embedding_cache else None
+        encoder = get_encoder(args.alignment_model, cache, args.batch_size)
+        sweep = sweep_sentences(args.source, args.target, encoder, threshold_grid(*args.thresholds),
+                                args.source_language, args.target_language, args.dtw_band, args.time_window,
+                                args.reference, args.tolerance)
+        sweep.to_csv(args.output_file, index=False)
+
+    print(f"{len(sweep)} thresholds written to {args.output_file}")
+    if args.reference and sweep['mae'].notna().any():
+        best = sweep.loc[sweep['mae'].idxmin()]
+        print(f"Lowest MAE {best['mae']:.3f}s at threshold {best['threshold']:.2f} ({int(best['aligned_pairs'])} pairs, RMSE {best['rmse']:.3f}s)")
+
+def evaluate_main(argv):
+    parser = argparse.ArgumentParser(prog="main.py evaluate", description="Compare the EVS of one or more alignment backends with manual annotations")
+    parser.add_argument('--reference', required=True, help='Directory of manual EVS CSVs, <pair>.csv or <pair>_Alignment_EVS.csv, '
+                                                          'with source_start and EVS (seconds or HH:MM:SS,mmm) or EVS_ms columns')
+    parser.add_argument('--results', required=True, nargs='+', metavar='BACKEND=DIRECTORY',
+                        help='Directories of <pair>_Alignment_EVS.csv outputs, one per backend, e.g. USE=out/USE SBERT=out/SBERT')
+    parser.add_argument('--output_directory', required=True, help='Directory for evaluation_pairs.csv and evaluation_corpus.csv')
+    parser.add_argument('--tolerance', type=float, default=1.0, help='Seconds between source starts within which a sentence pair matches a reference row')
+    parser.add_argument('--bootstrap', type=int, default=2000, help='Resamples of the pairs for the confidence intervals; 0 skips them')
+    parser.add_argument('--confidence', type=float, default=0.95, help='Level of the bootstrap confidence intervals')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the bootstrap resampling')
+    parser.add_argument('--values', action='store_true', help='Also write evs_values.csv with every EVS value of each backend and of the reference, e.g. for violin plots')
+
+    args = parser.parse_args(argv)
+    backends = {}
+    for result in args.results:
+        backend, separator, directory = result.partition('=')
+        if not separator:
+            parser.error(f"--results takes BACKEND=DIRECTORY, got {result}")
+        backends[backend] = directory
+
+    from EVS.evaluation import evaluate
+
+    pairs, corpus, values = evaluate(args.reference, backends, args.tolerance, args.bootstrap, args.confidence, args.seed)
+    os.makedirs(args.output_directory, exist_ok=True)
+    pairs.to_csv(os.path.join(args.output_directory, 'evaluation_pairs.csv'), index=False)
+    corpus.to_csv(os.path.join(args.output_directory, 'evaluation_corpus.csv'), index=False)
+    if args.values:
+        values.to_csv(os.path.join(args.output_directory, 'evs_values.csv'), index=False)
+    for row in corpus.itertuples():
+        print(f"{row.backend}: {row.pairs} pairs, mean EVS MAE {row.mean_evs_mae:.3f}s "
+              f"[{row.mean_evs_mae_low:.3f}, {row.mean_evs_mae_high:.3f}], RMSE {row.mean_evs_rmse:.3f}s, r = {row.correlation:.3f}")
+
+def serve_main(argv):
+    parser = argparse.ArgumentParser(prog="main.py serve", description="Keep segmenters and encoders loaded for other runs to use")
+    parser.add_argument('--socket', help='Unix socket to listen on (default ~/.cache/evs/server.sock)')
+    parser.add_argument('--stdio', action='store_true', help='Answer JSON requests on stdin/stdout instead of a socket')
+    parser.add_argument('--preload', nargs='*', default=[], metavar='MODEL',
+                        help='Models to load before serving: sbd:NAME:LANGUAGE or alignment:NAME, e.g. sbd:stanza:en alignment:USE')
+    parser.add_argument('--batch_size', type=int, default=32, help='Sentences per encoder batch; batches are grouped by length')
+
+    args = parser.parse_args(argv)
+
+    from EVS.server import ModelHost, default_socket, serve_socket, serve_stdio
+
+    host = ModelHost(args.batch_size)
+    for model in args.preload:
+        kind, name = model.split(':', 1)
+        language = None
+        if kind == 'sbd':
+            name, language = name.rsplit(':', 1)
+        response = host.respond(json.dumps({"op": "load", "kind": kind, "name": name, "language": language}))
+        if "error" in response:
+            print(f"Could not load {model}: {json.loads(response)['error']}", file=sys.stderr)
+    if args.stdio:
+        serve_stdio(host)
+    else:
+        serve_socket(host, args.socket or default_socket)
+
+def models_main(argv):
+    parser = argparse.ArgumentParser(prog="main.py models", description="Pin local model copies so that loading never needs the network")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('list', help='Show the pinned models')
+    for command, description in (('fetch', 'Download a model once and pin the local copy'),
+                                 ('pin', 'Pin a directory that already holds the model'),
+                                 ('unpin', 'Forget a pinned model')):
+        subparser = subparsers.add_parser(command, help=description)
+        subparser.add_argument('kind', choices=['sbd', 'alignment'])
+        subparser.add_argument('name', help='Backend name, e.g. stanza or USE')
+        if command == 'fetch':
+            subparser.add_argument('--directory', default=os.path.join(os.path.expanduser('~'), '.cache', 'evs', 'models'),
+                                   help='Where the local copy is saved')
+        if command == 'pin':
+            subparser.add_argument('path', help='Directory with the model files')
+        subparser.add_argument('--language', help='Language of an SBD model (spaCy and Stanza models are per language)')
+
+    args = parser.parse_args(argv)
+
+    from EVS import models
+
+    try:
+        if args.command == 'list':
+            for key, entry in sorted(models.read_store().items()):
+                print(f"{key}\t{entry['path']}")
+        elif args.command == 'fetch':
+            print(models.fetch(args.kind, args.name, args.directory, args.language)['path'])
+        elif args.command == 'pin':
+            print(models.pin(args.kind, args.name, args.path, args.language)['path'])
+        else:
+            models.unpin(args.kind, args.name, args.language)
+    except (KeyError, NotImplementedError, FileNotFoundError) as e:
+        print(e.args[0])
+        sys.exit(1)
+
+def cache_main(argv):
+    parser = argparse.ArgumentParser(prog="main.py cache", description="Inspect or empty the stage cache of batch and single runs")
+    parser.add_argument('command', choices=['status', 'clear'], help='status shows the stored artifacts per stage; clear removes them')
+    parser.add_argument('--stage_cache', metavar='DIRECTORY', help='Stage cache directory (default ~/.cache/evs/stages)')
+    parser.add_argument('--stages', nargs='+', choices=['segmentation', 'encoding', 'alignment'], metavar='STAGE',
+                        help='Only clear these stages')
+
+    args = parser.parse_args(argv)
+
+    from EVS.stage_cache import StageCache, stage_names
+
+    cache = StageCache(args.stage_cache)
+    if args.command == 'clear':
+        cache.clear(args.stages or stage_names)
+    print(cache.directory)
+    for name, (entries, size) in cache.usage().items():
+        print(f"{name}\t{entries} artifacts\t{size / 1024 / 1024:.1f} MB")
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] == 'batch':
+        return batch_main(argv[1:])
+    if argv and argv[0] == 'stream':
+        return stream_main(argv[1:])
+    if argv and argv[0] == 'sweep':
+        return sweep_main(argv[1:])
+    if argv and argv[0] == 'evaluate':
+        return evaluate_main(argv[1:])
+    if argv and argv[0] == 'serve':
+        return serve_main(argv[1:])
+    if argv and argv[0] == 'models':
+        return models_main(argv[1:])
+    if argv and argv[0] == 'cache':
+        return cache_main(argv[1:])
+
+    parser = argparse.ArgumentParser(description="Automated EVS Measurement", epilog="Use `main.py batch --help` to process a corpus manifest, `main.py stream --help` for live sessions, "
+                                            "`main.py sweep --help` to compare similarity thresholds, `main.py evaluate --help` to score EVS against manual annotations, "
+                                            "`main.py serve --help` to keep models loaded between runs, `main.py models --help` to pin local model copies "
+                                            "and `main.py cache --help` for the stage cache.")
+    parser.add_argument('--sbd_model', choices=list(sbd_backends), required=True, help='Model for sentence boundary detection')
+    parser.add_argument('--sbd_processes', type=int, default=1, help='Processes spaCy uses to segment chunks of one transcript')
+    parser.add_argument('--pause_ms', nargs='+', type=pause_value, metavar='MS',
+                        help='Silence that ends a sentence for the pause segmenter, and where spaCy and Stanza cut chunks; MS for every language or LANGUAGE=MS, e.g. 1800 pt=1500')
+    parser.add_argument('--punctuation_pause_ms', nargs='+', type=pause_value, metavar='MS',
+                        help='Silence the pause segmenter requires after final punctuation; MS for every language or LANGUAGE=MS')
     parser.add_argument('--sbd_language', choices=['en', 'pt'], required=True, help='Language for sentence boundary detection')
     parser.add_argument('--asr_output_directory', required=True, help='Path to the input directory containing ASR output files')
     parser.add_argument('--sbd_output_directory', required=True, help='Path to the output directory for sentence boundary detection results')
-    parser.add_argument('--alignment_model', choices=['LASER', 'mT5', 'SBERT', 'USE', 'XLM_Roberta'], required=True, help='Model for cross-lingual alignment')
+    parser.add_argument('--alignment_model', choices=list(alignment_backends), required=True, help='Model for cross-lingual alignment')
     parser.add_argument('--source_directory', required=True, help='Path to the source directory containing English sentences')
     parser.add_argument('--target_directory', required=True, help='Path to the target directory containing Portuguese sentences')
     parser.add_argument('--alignment_output_directory', required=True, help='Path to the output directory for cross-lingual alignment results')
-    parser.add_argument('--similarity_threshold', type=float, default=0.7, help='Similarity threshold for aligning sentences')
-    
-    args = parser.parse_args()
-
-    # Run the chosen SBD model
-    if args.sbd_model == 'punkt':
-        if args.sbd_language == 'en':
-            punkt_en.process_sbd(args.asr_output_directory, args.sbd_output_directory)
-        elif args.sbd_language == 'pt':
-            punkt_pt.process_sbd(args.asr_output_directory, args.sbd_output_directory)
-    elif args.sbd_model == 'spacy':
-        if args.sbd_language == 'en':
-            spacy_en.process_sbd(args.asr_output_directory, args.sbd_output_directory)
-        elif args.sbd_language == 'pt':
-            spacy_pt.process_sbd(args.asr_output_directory, args.sbd_output_directory)
-    elif args.sbd_model == 'stanza':
-        if args.sbd_language == 'en':
-            stanza_en.process_sbd(args.asr_output_directory, args.sbd_output_directory)
-        elif args.sbd_language == 'pt':
-            stanza_pt.process_sbd(args.asr_output_directory, args.sbd_output_directory)
-
-    # Run the chosen cross-lingual alignment model
-    if args.alignment_model == 'LASER':
-        LASER.align_sentences(args.source_directory, args.target_directory, args.alignment_output_directory, args.similarity_threshold)
-    elif args.alignment_model == 'mT5':
-        mT5.align_sentences(args.source_directory, args.target_directory, args.alignment_output_directory, args.similarity_threshold)
-    elif args.alignment_model == 'SBERT':
-        SBERT.align_sentences(args.source_directory, args.target_directory, args.alignment_output_directory, args.similarity_threshold)
-    elif args.alignment_model == 'USE':
-        USE.align_sentences(args.source_directory, args.target_directory, args.alignment_output_directory, args.similarity_threshold)
-    elif args.alignment_model == 'XLM_Roberta':
-    XLM_Roberta.align_sentences(args.source_directory, args.target_directory, args.alignment_output_directory, args.similarity_threshold)
-
-if name == "main":
-main()
+    parser.add_argument('--similarity_threshold', type=float, default=default_similarity_threshold, help='Similarity threshold for aligning sentences')
+    parser.add_argument('--source_language', default='en', help='Language code of the source sentences (used by LASER)')
+    parser.add_argument('--target_language', default='pt', help='Language code of the target sentences (used by LASER)')
+    parser.add_argument('--dtw_band', type=int, help='Sakoe-Chiba band radius (in sentences) for DTW; the full grid is searched by default')
+    parser.add_argument('--time_window', type=float, nargs=2, metavar=('BEFORE', 'AFTER'),
+                        help='Only align target sentences starting BEFORE seconds before to AFTER seconds after the source sentence, e.g. 2 15')
+    parser.add_argument('--aligner', choices=['dtw', 'anchors'], default='dtw',
+                        help='dtw pairs sentences one to one; anchors also aligns sentences the interpreter merged or split (time window default 2 15)')
+    parser.add_argument('--batch_size', type=int, default=32, help='Sentences per encoder batch; batches are grouped by length')
+    parser.add_argument('--embedding_cache', help='SQLite file that stores sentence embeddings across runs')
+    parser.add_argument('--cache_size_mb', type=int, default=1024, help='Size limit of the embedding cache; least recently used entries are evicted')
+    parser.add_argument('--intermediate', choices=['csv', 'npz', 'parquet'], default='csv',
+                        help='Format of the segmented sentence files; npz and parquet store int64 times and embeddings for fast re-runs')
+    parser.add_argument('--model_server', metavar='SOCKET', help='Use the models kept loaded by `main.py serve` on this socket')
+    parser.add_argument('--stage_cache', metavar='DIRECTORY',
+                        help='Where segmented tables, embeddings and alignments are stored by the fingerprint of their inputs (default ~/.cache/evs/stages)')
+    parser.add_argument('--no_stage_cache', action='store_true', help='Run every stage and store nothing')
+    parser.add_argument('--stage_cache_size_mb', type=int, default=4096,
+                        help='Size limit of the stage cache; least recently used artifacts are removed')
+    parser.add_argument('--force', nargs='*', choices=['segmentation', 'encoding', 'alignment'], metavar='STAGE',
+                        help='Recompute these stages (segmentation, encoding, alignment) even if they are stored; all of them without a STAGE')
+    parser.add_argument('--profile', nargs='?', const='evs_profile.json', metavar='REPORT',
+                        help='Write wall time, CPU time, peak RSS and counts per stage to a JSON report (default evs_profile.json)')
+    parser.add_argument('--profile_stage', metavar='STAGE',
+                        help='Also run one stage (e.g. encoding, dtw, segmentation) under cProfile and dump it next to the report')
+
+    args = parser.parse_args(argv)
+    use_model_server(args.model_server)
+
+    # The pipeline modules pull in pandas and numpy, so they are only
+    # imported once the arguments are valid; the chosen models load on first use.
+    from EVS.SBD import get_segmenter, pause_options, process_sbd
+    from EVS.alignment import EmbeddingCache, align_directories, get_encoder
+    from EVS.profiling import profiled
+    from EVS.stage_cache import StageCache, status_report
+
+    directory = stage_cache_directory(args)
+    stage_cache = StageCache(directory, forced_stages(args.force), args.stage_cache_size_mb * 1024 * 1024) if directory else None
+
+    with profiled(args.profile, args.profile_stage, argv):
+        # Run the chosen SBD model
+        segmenter = get_segmenter(args.sbd_model, args.sbd_language, n_process=args.sbd_processes,
+                                  **pause_options(args.sbd_language, args.pause_ms, args.punctuation_pause_ms))
+        process_sbd(args.asr_output_directory, args.sbd_output_directory, segmenter, f".{args.intermediate}", stage_cache)
+
+        # Run the chosen cross-lingual alignment model
+        cache = EmbeddingCache(args.embedding_cache, args.cache_size_mb * 1024 * 1024) if args.embedding_cache else None
+        encoder = get_encoder(args.alignment_model, cache, args.batch_size)
+        align_directories(args.source_directory, args.target_directory, args.alignment_output_directory,
+                          args.similarity_threshold, encoder, args.source_language, args.target_language, args.dtw_band, args.time_window,
+                          args.aligner, stage_cache)
+
+    if stage_cache is not None:
+        print(f"Stage cache {stage_cache.directory}: {status_report(stage_cache.status)}")
 
+if __name__ == "__main__":
+    main()